@@ -0,0 +1,55 @@
+def post_data(post):
+    """Краткое представление поста для лент, без полного текста."""
+    return {
+        'id': post.pk,
+        'text_preview': post.text_preview,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def post_detail_data(post):
+    return {
+        **post_data(post),
+        'text': post.text,
+        'comments_count': post.comments_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def author_data(author, stats):
+    return {
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }
+
+
+def group_data(group):
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }
+
+
+def page_data(page, serialize=post_data):
+    """Страница курсорной пагинации: объекты и курсоры соседних страниц."""
+    return {
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
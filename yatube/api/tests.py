@@ -0,0 +1,177 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiReadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(title='Group', slug='test_slug')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='TestText'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_feeds_return_compact_json(self):
+        """Ленты отдают посты и курсоры соседних страниц."""
+        urls = (
+            reverse('api:posts'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertEqual(data['results'][0]['group'], 'test_slug')
+                self.assertIsNone(data['next'])
+
+    def test_repeat_poll_returns_304_without_queries(self):
+        """Повторный запрос с ETag получает 304 без запросов к базе."""
+        urls = (
+            reverse('api:posts'),
+            reverse('api:post', kwargs={'post_id': self.post.pk}),
+            reverse('api:comments', kwargs={'post_id': self.post.pk}),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_refresh_etag(self):
+        """Новый комментарий и новый пост меняют ETag затронутых ответов."""
+        detail_url = reverse('api:post', kwargs={'post_id': self.post.pk})
+        detail_etag = self.client.get(detail_url)['ETag']
+        index_etag = self.client.get(reverse('api:posts'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Hi'
+            )
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.json()['comments_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_post = Post.objects.create(author=self.user, text='New')
+        response = self.client.get(
+            reverse('api:posts'), HTTP_IF_NONE_MATCH=index_etag
+        )
+        self.assertEqual(response.json()['results'][0]['id'], new_post.pk)
+
+    def test_unknown_objects_return_json_404(self):
+        """Несуществующие объекты дают 404 в формате JSON."""
+        urls = (
+            reverse('api:post', kwargs={'post_id': 0}),
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+
+class ApiWriteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.post = Post.objects.create(author=cls.author, text='TestText')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def post_json(self, client, url, data, method='post'):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_create_post_and_comment(self):
+        """Авторизованный пользователь создает посты и комментарии."""
+        response = self.post_json(
+            self.guest_client, reverse('api:posts'), {'text': 'Guest'}
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.post_json(
+            self.authorized_client, reverse('api:posts'), {'text': 'Created'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Post.objects.filter(
+            author=self.user, text='Created'
+        ).exists())
+        response = self.post_json(
+            self.authorized_client,
+            reverse('api:comments', kwargs={'post_id': self.post.pk}),
+            {'text': 'Comment'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], self.user.username)
+
+    def test_invalid_data_returns_form_errors(self):
+        """Невалидные данные возвращают ошибки формы."""
+        response = self.post_json(
+            self.authorized_client, reverse('api:posts'), {'text': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+    def test_only_author_can_edit_post(self):
+        """Редактировать пост через API может только автор."""
+        url = reverse('api:post', kwargs={'post_id': self.post.pk})
+        response = self.post_json(
+            self.authorized_client, url, {'text': 'Edited'}, method='patch'
+        )
+        self.assertEqual(response.status_code, 403)
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = self.post_json(
+            author_client, url, {'text': 'Edited'}, method='patch'
+        )
+        self.assertEqual(response.json()['text'], 'Edited')
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют ленту подписок."""
+        follow_url = reverse(
+            'api:follow', kwargs={'username': self.author.username}
+        )
+        feed_url = reverse('api:follow_index')
+        self.assertEqual(self.guest_client.get(feed_url).status_code, 401)
+        etag = self.authorized_client.get(feed_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.authorized_client.post(follow_url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['followers_count'], 1)
+        response = self.authorized_client.get(
+            feed_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.json()['results'][0]['id'], self.post.pk)
+        response = self.authorized_client.delete(follow_url)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
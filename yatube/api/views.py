@@ -0,0 +1,220 @@
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
+
+from posts import caching, freshness
+from posts.counters import stats_for
+from posts.feed import follow_feed
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import comment_paginator, feed_paginator
+
+from .serializers import (
+    author_data, comment_data, group_data, page_data, post_detail_data
+)
+
+
+def conditional(scopes_func):
+    """Условный GET по версиям областей кэша.
+
+    ETag и Last-Modified вычисляются из кэша до вызова представления,
+    поэтому повторный запрос без изменений получает 304 без обращения
+    к базе и без сериализации. scopes_func возвращает None, если
+    области определить нельзя, — тогда запрос обрабатывается как обычно.
+    Клиенты обязаны перепроверять ответ при каждом запросе.
+    """
+    def etag_func(request, *args, **kwargs):
+        scopes = scopes_func(request, *args, **kwargs)
+        return caching.etag(request, *scopes) if scopes else None
+
+    def last_modified_func(request, *args, **kwargs):
+        scopes = scopes_func(request, *args, **kwargs)
+        return caching.last_modified(*scopes) if scopes else None
+
+    def decorator(view):
+        view = condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _unauthorized():
+    return _error('Требуется авторизация', 401)
+
+
+def _not_found():
+    return _error('Не найдено', 404)
+
+
+def _payload(request):
+    """Данные запроса из JSON-тела или формы; None для битого JSON."""
+    if request.content_type != 'application/json':
+        return request.POST
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _form_errors(form):
+    return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@conditional(freshness.index_scopes)
+def posts(request):
+    if request.method == 'POST':
+        return _create_post(request)
+    posts = Post.feed.all()
+    page = caching.cached_paginator(request, posts, caching.GLOBAL_SCOPE)
+    return JsonResponse(page_data(page))
+
+
+@transaction.atomic
+def _create_post(request):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    data = _payload(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+    form = PostForm(data, files=request.FILES or None)
+    if not form.is_valid():
+        return _form_errors(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    return JsonResponse(post_detail_data(post), status=201)
+
+
+@require_http_methods(['GET', 'HEAD', 'PATCH'])
+@conditional(freshness.post_scopes)
+def post(request, post_id):
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        return _not_found()
+    if request.method in ('GET', 'HEAD'):
+        return JsonResponse(post_detail_data(post))
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    if post.author != request.user:
+        return _error('Редактировать можно только свои записи', 403)
+    data = _payload(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+    form = PostForm(
+        {'text': post.text, 'group': post.group_id, **data},
+        instance=post
+    )
+    if not form.is_valid():
+        return _form_errors(form)
+    post = form.save()
+    return JsonResponse(post_detail_data(post))
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@conditional(freshness.post_scopes)
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    if request.method == 'POST':
+        return _create_comment(request, post_id)
+    comments = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    page = comment_paginator(request, comments)
+    return JsonResponse(page_data(page, comment_data))
+
+
+@transaction.atomic
+def _create_comment(request, post_id):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    data = _payload(request)
+    if data is None:
+        return _error('Некорректный JSON', 400)
+    form = CommentForm(data)
+    if not form.is_valid():
+        return _form_errors(form)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post_id = post_id
+    comment.save()
+    return JsonResponse(comment_data(comment), status=201)
+
+
+@require_http_methods(['GET', 'HEAD'])
+@conditional(freshness.group_scopes)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _not_found()
+    posts = Post.feed.filter(group=group)
+    page = caching.cached_paginator(
+        request, posts, caching.group_scope(group.pk)
+    )
+    return JsonResponse({'group': group_data(group), **page_data(page)})
+
+
+@require_http_methods(['GET', 'HEAD'])
+@conditional(freshness.profile_scopes)
+def profile(request, username):
+    author = User.objects.select_related('stats').filter(
+        username=username
+    ).first()
+    if author is None:
+        return _not_found()
+    posts = Post.feed.filter(author=author)
+    page = caching.cached_paginator(
+        request, posts, caching.author_scope(author.pk), caching.GROUPS_SCOPE
+    )
+    return JsonResponse(
+        {'author': author_data(author, stats_for(author)), **page_data(page)}
+    )
+
+
+@require_http_methods(['GET', 'HEAD'])
+@conditional(freshness.follow_scopes)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    entries, pulled = follow_feed(request.user)
+    return JsonResponse(page_data(feed_paginator(request, entries, pulled)))
+
+
+@require_http_methods(['POST', 'DELETE'])
+@transaction.atomic
+def follow(request, username):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _not_found()
+    if request.method == 'DELETE':
+        Follow.objects.filter(user=request.user, author=author).delete()
+        return HttpResponse(status=204)
+    if author == request.user:
+        return _error('Нельзя подписаться на самого себя', 400)
+    _, created = Follow.objects.get_or_create(
+        user=request.user,
+        author=author
+    )
+    return JsonResponse(
+        author_data(author, stats_for(author)),
+        status=201 if created else 200
+    )
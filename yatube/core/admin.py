@@ -0,0 +1,78 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from . import profiling
+from .models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'created', 'method', 'path', 'view_name', 'duration', 'samples',
+        'trigger'
+    )
+    list_filter = ('view_name', 'trigger')
+    search_fields = ('path',)
+    readonly_fields = (
+        'created', 'method', 'path', 'view_name', 'duration', 'samples',
+        'trigger', 'download', 'top_stacks'
+    )
+    exclude = ('filename',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='core_requestprofile_download',
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            stacks = open(profiling.profile_path(profile.filename), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            stacks,
+            as_attachment=True,
+            filename=f'profile-{profile.pk}.folded',
+            content_type='text/plain; charset=utf-8'
+        )
+
+    @admin.display(description='Файл для flamegraph')
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">profile-{}.folded</a>',
+            reverse('admin:core_requestprofile_download', args=[obj.pk]),
+            obj.pk
+        )
+
+    @admin.display(description='Самые частые стеки')
+    def top_stacks(self, obj):
+        lines = profiling.read_stacks(obj)[:profiling.TOP_STACKS]
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>',
+            '\n\n'.join(lines) or 'Файл профиля удален'
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'profile_token': profiling.make_token(),
+            'token_param': profiling.TOKEN_PARAM,
+        }
+        return super().changelist_view(request, extra_context)
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
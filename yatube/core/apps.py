@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import apply_sqlite_pragmas, install_query_dispatch
+        from .models import RequestProfile
+        from .profiling import remove_profile_file
+        connection_created.connect(apply_sqlite_pragmas)
+        connection_created.connect(install_query_dispatch)
+        post_delete.connect(remove_profile_file, sender=RequestProfile)
@@ -0,0 +1,15 @@
+from functools import partial
+
+from posts.notifications import unread_count
+
+
+def unread_notifications(request):
+    """Добавляет число непрочитанных уведомлений пользователя.
+
+    Число читается, только если шаблон его выводит.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'unread_notifications': partial(unread_count, request.user.pk)
+    }
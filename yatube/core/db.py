@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection as default_connection
+
+REPLICA_ALIAS = 'replica'
+# Сессии и пользователи читаются только из default: после входа
+# отстающая реплика показала бы пользователя гостем.
+PRIMARY_APPS = ('auth', 'sessions')
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('busy_timeout', 20000),
+)
+
+read_only = ContextVar('read_only', default=False)
+# Обертки выполнения SQL, действующие в текущем контексте. Контекст
+# копируется в потоки sync_to_async, поэтому обертки видят запросы
+# к базе из любого потока, работающего на запрос к сайту.
+query_wrappers = ContextVar('query_wrappers', default=())
+# Наблюдатели за потоками запроса (профилировщик): у каждого есть
+# контекстный менеджер watch_thread(), в который входит поток пула.
+thread_watchers = ContextVar('thread_watchers', default=())
+
+_executor = None
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Настраивает новое соединение SQLite под конкурентную нагрузку.
+
+    WAL позволяет читателям не блокировать писателя, а busy_timeout
+    заставляет писателя ждать блокировку вместо ошибки
+    "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    is_read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS:
+            if is_read_only and name == 'journal_mode':
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class ReadReplicaRouter:
+    """Отправляет чтения read-only представлений на соединение replica.
+
+    Все записи, чтения остальных представлений и чтения моделей из
+    PRIMARY_APPS идут в default. Без настроенного соединения replica
+    роутер ничего не меняет.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model is not None and model._meta.app_label in PRIMARY_APPS:
+            return 'default'
+        if read_only.get() and REPLICA_ALIAS in settings.DATABASES:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+def dispatch_queries(execute, sql, params, many, context):
+    """Передает запрос через обертки из query_wrappers текущего контекста."""
+    for wrapper in reversed(query_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_dispatch(sender, connection, **kwargs):
+    if dispatch_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch_queries)
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Пропускает через wrapper все запросы к базе внутри блока."""
+    token = query_wrappers.set(query_wrappers.get() + (wrapper,))
+    try:
+        yield wrapper
+    finally:
+        query_wrappers.reset(token)
+
+
+@contextmanager
+def watch_request_threads(watcher):
+    """Сообщает watcher о потоках пула, работающих внутри блока."""
+    token = thread_watchers.set(thread_watchers.get() + (watcher,))
+    try:
+        yield watcher
+    finally:
+        thread_watchers.reset(token)
+
+
+def _runs_inline():
+    """Потоки пула не видят базу SQLite в памяти: она у каждого своя."""
+    return settings.ASYNC_DB_WORKERS == 0 or (
+        default_connection.vendor == 'sqlite'
+        and default_connection.is_in_memory_db()
+    )
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_WORKERS,
+            thread_name_prefix='db'
+        )
+    return _executor
+
+
+def _in_pool_thread(func):
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        with ExitStack() as stack:
+            for watcher in thread_watchers.get():
+                stack.enter_context(watcher.watch_thread())
+            return func(*args, **kwargs)
+    return run
+
+
+def database_sync_to_async(func):
+    """sync_to_async для кода, который ходит в базу и рендерит шаблоны.
+
+    Код выполняется в ограниченном пуле из ASYNC_DB_WORKERS потоков:
+    сколько бы соединений ни держал процесс, к базе одновременно идут
+    не больше ASYNC_DB_WORKERS запросов.
+    """
+    if _runs_inline():
+        return sync_to_async(func)
+    return sync_to_async(
+        _in_pool_thread(func),
+        thread_sensitive=False,
+        executor=_get_executor()
+    )
+
+
+def async_view(view_func):
+    """Асинхронная версия синхронного представления.
+
+    Цикл событий не ждет базу и шаблоны: представление целиком
+    выполняется через database_sync_to_async.
+    """
+    @wraps(view_func)
+    async def view(request, *args, **kwargs):
+        return await database_sync_to_async(view_func)(
+            request, *args, **kwargs
+        )
+    return view
@@ -0,0 +1,184 @@
+"""Гистограммы времени работы в памяти процесса и их вывод для Prometheus.
+
+Каждый процесс копит свои гистограммы, Prometheus опрашивает процессы
+по отдельности. Внешний сборщик для работы не нужен.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyMemcacheCache
+from django.template.backends.django import DjangoTemplates, Template
+
+REQUEST_SECONDS = 'yatube_request_duration_seconds'
+SQL_SECONDS = 'yatube_sql_duration_seconds'
+TEMPLATE_SECONDS = 'yatube_template_render_seconds'
+CACHE_SECONDS = 'yatube_cache_lookup_seconds'
+THUMBNAIL_SECONDS = 'yatube_thumbnail_seconds'
+METRICS_HELP = {
+    REQUEST_SECONDS: 'Время обработки запроса по представлениям.',
+    SQL_SECONDS: 'Суммарное время SQL за один запрос.',
+    TEMPLATE_SECONDS: 'Время рендеринга шаблона.',
+    CACHE_SECONDS: 'Время чтения из кэша.',
+    THUMBNAIL_SECONDS: 'Время подготовки миниатюры.',
+}
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+# Имя представления текущего запроса, метка для вложенных замеров.
+current_view = ContextVar('current_view', default='')
+_in_cache_lookup = ContextVar('in_cache_lookup', default=False)
+
+
+class Histogram:
+    """Накопительная гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Пары (граница, накопленное число), сумма и общее число."""
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            running += count
+            cumulative.append((bound, running))
+        return cumulative, total, running
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def observe(name, seconds, **labels):
+    key = name, tuple(sorted(labels.items()))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.observe(seconds)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Замеряет время блока; по умолчанию с меткой текущего представления."""
+    labels.setdefault('view', current_view.get())
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def reset():
+    with _registry_lock:
+        _histograms.clear()
+
+
+def _labels(pairs):
+    return ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    )
+
+
+def render():
+    """Все гистограммы в текстовом формате Prometheus 0.0.4."""
+    with _registry_lock:
+        items = sorted(_histograms.items())
+    lines, described = [], set()
+    for (name, labels), histogram in items:
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {METRICS_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+        buckets, total, count = histogram.snapshot()
+        for bound, running in buckets:
+            lines.append(
+                f'{name}_bucket{{{_labels(labels + (("le", bound),))}}} '
+                f'{running}'
+            )
+        suffix = f'{{{_labels(labels)}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {total}')
+        lines.append(f'{name}_count{suffix} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+class SqlTimer:
+    """Обертка выполнения SQL, суммирующая время запросов к базе."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timer(TEMPLATE_SECONDS):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, замеряющий рендеринг шаблонов."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self
+        )
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self
+        )
+
+
+class TimedCacheMixin:
+    """Замер чтений кэша; вложенные чтения внутри get_many не считаются."""
+
+    def _timed(self, method, *args, **kwargs):
+        if _in_cache_lookup.get():
+            return method(*args, **kwargs)
+        token = _in_cache_lookup.set(True)
+        try:
+            with timer(CACHE_SECONDS):
+                return method(*args, **kwargs)
+        finally:
+            _in_cache_lookup.reset(token)
+
+    def get(self, *args, **kwargs):
+        return self._timed(super().get, *args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self._timed(super().get_many, *args, **kwargs)
+
+
+class TimedLocMemCache(TimedCacheMixin, LocMemCache):
+    pass
+
+
+class TimedPyMemcacheCache(TimedCacheMixin, PyMemcacheCache):
+    pass
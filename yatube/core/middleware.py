@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics, profiling
+from .db import read_only, watch_request_threads, wrap_queries
+from .models import RequestProfile
+from .queries import inspect_queries
+
+logger = logging.getLogger(__name__)
+
+
+class HybridMiddleware:
+    """Основа middleware, работающих и под WSGI, и под ASGI.
+
+    Наследник описывает контекстный менеджер around(request), внутри
+    которого вызывается остальная цепочка, и finish(request, response),
+    выполняемый после нее. Под ASGI цепочка ожидается без перехода в
+    отдельный поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with self.around(request):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        with self.around(request):
+            response = await self.get_response(request)
+        return await self.afinish(request, response)
+
+    @contextmanager
+    def around(self, request):
+        yield
+
+    def finish(self, request, response):
+        return response
+
+    async def afinish(self, request, response):
+        return self.finish(request, response)
+
+
+class AsgiUrlconfMiddleware(HybridMiddleware):
+    """Под ASGI разрешает адреса по ASGI_URLCONF.
+
+    Там ленты обслуживают асинхронные представления. Под WSGI они
+    остаются синхронными: асинхронное представление добавило бы к
+    каждому запросу переходы между потоками.
+    """
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await super().__acall__(request)
+
+
+class ReadOnlyViewsMiddleware(HybridMiddleware):
+    """Помечает GET-запросы к read-only представлениям для роутера БД."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.view_names = set(settings.READ_REPLICA_VIEWS)
+
+    @contextmanager
+    def around(self, request):
+        try:
+            yield
+        finally:
+            read_only.set(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in self.view_names
+        ):
+            read_only.set(True)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление превысило бюджет запросов или делает N+1."""
+
+
+class QueryInspectionMiddleware(HybridMiddleware):
+    """Проверяет запросы к базе выборки запросов к сайту.
+
+    Доля проверяемых запросов задается QUERY_INSPECTION_SAMPLE_RATE.
+    Бюджет берется из @query_budget у представления. Нарушения пишутся
+    в лог, а при QUERY_INSPECTION_STRICT поднимают QueryBudgetExceeded,
+    чтобы тест упал. Проблемы сохраняются в response.query_problems.
+    """
+
+    @contextmanager
+    def around(self, request):
+        if random.random() >= settings.QUERY_INSPECTION_SAMPLE_RATE:
+            yield
+            return
+        with inspect_queries() as log:
+            request._query_log = log
+            yield
+
+    def finish(self, request, response):
+        log = getattr(request, '_query_log', None)
+        if log is None:
+            return response
+        view_name = getattr(request.resolver_match, 'view_name', None)
+        problems = log.problems(getattr(request, '_query_budget', None))
+        response.query_problems = problems
+        if problems:
+            message = (
+                f'{request.method} {request.path} ({view_name}): '
+                + '; '.join(problems)
+            )
+            if settings.QUERY_INSPECTION_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Замеряет время запроса и суммарное время SQL по представлениям.
+
+    Имя представления кладется в metrics.current_view, чтобы замеры
+    шаблонов и кэша внутри запроса получили ту же метку.
+    """
+
+    @contextmanager
+    def around(self, request):
+        request._started = time.perf_counter()
+        try:
+            with wrap_queries(metrics.SqlTimer()) as sql:
+                request._sql_timer = sql
+                yield
+        finally:
+            metrics.current_view.set('')
+
+    def finish(self, request, response):
+        elapsed = time.perf_counter() - request._started
+        view = getattr(request.resolver_match, 'view_name', '')
+        metrics.observe(metrics.REQUEST_SECONDS, elapsed, view=view)
+        metrics.observe(
+            metrics.SQL_SECONDS, request._sql_timer.seconds, view=view
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics.current_view.set(request.resolver_match.view_name)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Профилирует запрос целиком, включая рендеринг шаблонов.
+
+    Включается подписанным токеном в параметре ?profile= или заголовке
+    X-Profile (токен выдается сотрудникам в админке) либо для доли
+    PROFILING_SAMPLE_RATE всех запросов. Под ASGI снимаются и потоки
+    пула, в которых асинхронные представления ходят в базу.
+    """
+
+    @contextmanager
+    def around(self, request):
+        if profiling.has_valid_token(request):
+            trigger = RequestProfile.TRIGGER_TOKEN
+        elif random.random() < settings.PROFILING_SAMPLE_RATE:
+            trigger = RequestProfile.TRIGGER_SAMPLE
+        else:
+            yield
+            return
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            sampler = stack.enter_context(
+                profiling.StackSampler(settings.PROFILING_INTERVAL)
+            )
+            stack.enter_context(watch_request_threads(sampler))
+            yield
+        request._profile = (
+            sampler.stacks, time.perf_counter() - started, trigger
+        )
+
+    def finish(self, request, response):
+        profile = getattr(request, '_profile', None)
+        if profile is None:
+            return response
+        try:
+            profiling.save_profile(request, *profile)
+        except Exception:
+            logger.exception('Не удалось сохранить профиль %s', request.path)
+        return response
+
+    async def afinish(self, request, response):
+        return await sync_to_async(self.finish)(request, response)
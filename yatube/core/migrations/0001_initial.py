@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Адрес')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('samples', models.PositiveIntegerField(verbose_name='Снимков стека')),
+                ('trigger', models.CharField(choices=[('token', 'По подписанной ссылке'), ('sample', 'Случайная выборка')], max_length=10, verbose_name='Причина')),
+                ('filename', models.CharField(editable=False, max_length=100, verbose_name='Файл')),
+            ],
+            options={
+                'verbose_name': 'request profile',
+                'verbose_name_plural': 'request profiles',
+                'ordering': ['-created', '-pk'],
+            },
+        ),
+    ]
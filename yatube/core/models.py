@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Описание профиля запроса; сами снимки стека лежат файлом."""
+    PATH_LENGTH = 2000
+    TRIGGER_TOKEN = 'token'
+    TRIGGER_SAMPLE = 'sample'
+    TRIGGERS = (
+        (TRIGGER_TOKEN, 'По подписанной ссылке'),
+        (TRIGGER_SAMPLE, 'Случайная выборка'),
+    )
+
+    created = models.DateTimeField('Дата', auto_now_add=True, db_index=True)
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=PATH_LENGTH)
+    view_name = models.CharField(
+        'Представление',
+        max_length=200,
+        blank=True
+    )
+    duration = models.FloatField('Время, мс')
+    samples = models.PositiveIntegerField('Снимков стека')
+    trigger = models.CharField('Причина', max_length=10, choices=TRIGGERS)
+    filename = models.CharField('Файл', max_length=100, editable=False)
+
+    class Meta:
+        ordering = ['-created', '-pk']
+        verbose_name = "request profile"
+        verbose_name_plural = "request profiles"
+
+    def __str__(self):
+        return f'{self.method} {self.path}: {self.duration} мс'
+
+
+class Blob(models.Model):
+    """Счетчик ссылок на файл, сохраненный под хэшем содержимого."""
+    key = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+    size = models.PositiveBigIntegerField('Размер, байт')
+
+    class Meta:
+        verbose_name = "blob"
+        verbose_name_plural = "blobs"
+
+    def __str__(self):
+        return f'{self.key}: {self.refs}'
@@ -0,0 +1,173 @@
+"""Профилирование отдельных запросов в продакшене.
+
+Пока обрабатывается запрос, фоновый поток снимает стек его потока с
+интервалом PROFILING_INTERVAL. Снимки сворачиваются в формат collapsed
+stacks ("a;b;c 12"), который понимают flamegraph.pl и speedscope.
+Профили лежат файлами в PROFILES_DIR, в базе хранится только описание;
+старше PROFILES_KEEP последних профили удаляются.
+"""
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import signing
+
+from .models import RequestProfile
+
+TOKEN_PARAM = 'profile'
+TOKEN_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'core.profiling'
+TOP_STACKS: int = 30
+
+
+def make_token():
+    """Подписанный токен, включающий профилирование запроса."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_PARAM)
+
+
+def has_valid_token(request):
+    token = request.GET.get(TOKEN_PARAM) or request.META.get(TOKEN_HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def source_prefixes():
+    """Каталоги, которые отрезаются от путей файлов в именах кадров."""
+    return sorted(
+        {str(settings.BASE_DIR), *filter(None, sys.path)},
+        key=len,
+        reverse=True
+    )
+
+
+def _frame_name(frame, prefixes):
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    name = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+    return name.replace(';', ',')
+
+
+def collapse(frame, prefixes=()):
+    """Стек кадра от корня к вершине в одну строку через ';'."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame, prefixes))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Снимает стеки потоков запроса, пока открыт блок with.
+
+    Поток, создавший профилировщик, снимается всегда; потоки пула
+    добавляются на время работы через watch_thread().
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_ids = {threading.get_ident()}
+        self.stacks = Counter()
+        self.prefixes = source_prefixes()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='profiler', daemon=True
+        )
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[collapse(frame, self.prefixes)] += 1
+
+    @contextmanager
+    def watch_thread(self):
+        thread_id = threading.get_ident()
+        if thread_id in self.thread_ids:
+            yield
+            return
+        self.thread_ids.add(thread_id)
+        try:
+            yield
+        finally:
+            self.thread_ids.discard(thread_id)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def profile_path(filename):
+    return os.path.join(settings.PROFILES_DIR, filename)
+
+
+def read_stacks(profile):
+    """Строки collapsed stacks профиля или пустой список без файла."""
+    try:
+        with open(profile_path(profile.filename), encoding='utf-8') as source:
+            return source.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _clean_path(request):
+    """Адрес запроса без токена: токен не должен попасть в базу."""
+    params = request.GET.copy()
+    params.pop(TOKEN_PARAM, None)
+    query = params.urlencode()
+    return f'{request.path}?{query}' if query else request.path
+
+
+def save_profile(request, stacks, duration, trigger):
+    """Пишет профиль на диск, заводит его описание и чистит старые."""
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    filename = f'{uuid.uuid4().hex}.folded'
+    with open(profile_path(filename), 'w', encoding='utf-8') as output:
+        for stack, count in stacks.most_common():
+            output.write(f'{stack} {count}\n')
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=_clean_path(request)[:RequestProfile.PATH_LENGTH],
+        view_name=getattr(request.resolver_match, 'view_name', '') or '',
+        duration=round(duration * 1000, 3),
+        samples=sum(stacks.values()),
+        trigger=trigger,
+        filename=filename,
+    )
+    prune()
+    return profile
+
+
+def prune(keep=None):
+    """Оставляет keep последних профилей, остальные удаляет с файлами."""
+    keep = settings.PROFILES_KEEP if keep is None else keep
+    stale = RequestProfile.objects.order_by('-created', '-pk')[keep:]
+    for profile in stale:
+        profile.delete()
+
+
+def remove_profile_file(sender, instance, **kwargs):
+    try:
+        os.remove(profile_path(instance.filename))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,98 @@
+"""Рассылка событий по каналам подписчикам в цикле событий ASGI.
+
+Публикует синхронный код (сигналы моделей) из любого потока, получают
+асинхронные обработчики потоков событий. Брокер задается настройкой
+EVENTS_BROKER: LocalBroker доставляет события только внутри процесса,
+для нескольких процессов нужен брокер на общем сервере с тем же
+интерфейсом.
+"""
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+SUBSCRIPTION_QUEUE_SIZE: int = 100
+
+
+class Subscription:
+    """Очередь событий одного подписчика в его цикле событий.
+
+    Если подписчик не успевает читать, новые события отбрасываются:
+    медленный клиент не должен копить память процесса.
+    """
+
+    def __init__(self, loop, maxsize=SUBSCRIPTION_QUEUE_SIZE):
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        """Кладет событие в очередь; безопасно из любого потока."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Цикл событий уже закрыт: подписчика больше нет.
+            pass
+
+    def _put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self):
+        return await self._queue.get()
+
+
+class Broker(ABC):
+    """Интерфейс брокера событий."""
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Доставляет message подписчикам channel, не дожидаясь их."""
+
+    @abstractmethod
+    def subscribe(self, channels):
+        """Асинхронный контекстный менеджер, отдающий Subscription.
+
+        Пока блок открыт, в подписку приходят события всех channels.
+        """
+
+
+class LocalBroker(Broker):
+    """Брокер в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                for channel in channels:
+                    subscribers = self._subscriptions.get(channel)
+                    if subscribers is None:
+                        continue
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+
+broker = SimpleLazyObject(lambda: import_string(settings.EVENTS_BROKER)())
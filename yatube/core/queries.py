@@ -0,0 +1,107 @@
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.base import Node
+
+from .db import wrap_queries
+
+N_PLUS_ONE_THRESHOLD: int = 3
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+# Точки сохранения транзакций — не обращения к данным, и в тестах их
+# больше, чем в работе: TestCase оборачивает каждый тест в atomic.
+TRANSACTION_SQL_RE = re.compile(
+    r'^(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT) ', re.I
+)
+
+
+def query_budget(limit):
+    """Объявляет, сколько запросов к базе допустимо за один запрос к view.
+
+    В бюджет входят все запросы, включая чтение сессии и пользователя.
+    """
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def fingerprint(sql):
+    """Форма запроса без параметров: списки IN любой длины совпадают."""
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def query_origin():
+    """Место, откуда выполнен запрос: строка шаблона или строка кода.
+
+    Ближайший узел шаблона важнее кода Django под ним: именно
+    {{ post.author }} в цикле указывает на N+1.
+    """
+    frame = sys._getframe(1)
+    code_line = None
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if (
+            frame.f_code.co_name == 'render_annotated'
+            and isinstance(node, Node)
+            and node.origin is not None
+        ):
+            name = node.origin.template_name or node.origin.name
+            return f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            code_line is None
+            and filename.startswith(str(settings.BASE_DIR))
+            and filename != __file__
+        ):
+            code_line = f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_line
+
+
+class QueryLog:
+    """Запросы к базе, выполненные внутри inspect_queries()."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        if not TRANSACTION_SQL_RE.match(sql):
+            self.queries.append((fingerprint(sql), query_origin()))
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Формы запросов, повторенные threshold и более раз: признак N+1.
+
+        Возвращает тройки (форма, число повторов, места вызова).
+        """
+        counts = Counter(shape for shape, _ in self.queries)
+        return [
+            (shape, count, sorted({
+                origin for query_shape, origin in self.queries
+                if query_shape == shape and origin
+            }))
+            for shape, count in counts.items() if count >= threshold
+        ]
+
+    def problems(self, budget=None):
+        """Нарушения бюджета и N+1 в виде строк для лога и тестов."""
+        problems = []
+        if budget is not None and len(self) > budget:
+            problems.append(f'{len(self)} запросов при бюджете {budget}')
+        for shape, count, origins in self.repeated():
+            where = ', '.join(origins) or 'место неизвестно'
+            problems.append(f'N+1: {count} x {shape} ({where})')
+        return problems
+
+
+@contextmanager
+def inspect_queries():
+    """Записывает все запросы ко всем базам, выполненные внутри блока."""
+    with wrap_queries(QueryLog()) as log:
+        yield log
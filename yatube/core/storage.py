@@ -0,0 +1,260 @@
+"""Медиафайлы в объектном хранилище с адресацией по содержимому.
+
+ObjectStorage — хранилище Django поверх S3-совместимого клиента:
+put_object, get_object, head_object и delete_object с аргументами
+Bucket и Key, как у boto3. Клиент создается фабрикой из
+MEDIA_OBJECT_STORE; LocalObjectStore хранит объекты файлами в
+MEDIA_ROOT и заменяет S3 в разработке и тестах.
+
+ContentAddressedStorage сохраняет файлы с путями из
+CONTENT_ADDRESSED_PREFIXES под хэшем содержимого: одинаковые загрузки
+получают одно имя, делят байты и миниатюры sorl. Ссылки на такие файлы
+считаются в Blob, файл удаляется вместе с последней ссылкой.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from io import BytesIO
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils._os import safe_join
+from django.utils.encoding import filepath_to_uri
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import Blob
+
+HASH_CHUNK_SIZE: int = 64 * 1024
+MISSING_CODES = ('404', 'NoSuchKey', 'NotFound')
+
+
+class ObjectNotFound(Exception):
+    """Объекта нет; ответ устроен как у botocore ClientError."""
+
+    def __init__(self, key):
+        super().__init__(key)
+        self.response = {'Error': {'Code': 'NoSuchKey', 'Key': key}}
+
+
+def is_missing(error):
+    """Ошибка клиента означает, что объекта нет."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in MISSING_CODES
+
+
+class LocalObjectStore:
+    """S3-совместимый клиент с одним бакетом в каталоге root.
+
+    Без root объекты лежат в MEDIA_ROOT, поэтому файлы, сохраненные
+    раньше FileSystemStorage, остаются на своих местах.
+    """
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @property
+    def root(self):
+        return self._root or settings.MEDIA_ROOT
+
+    def _path(self, key):
+        return safe_join(self.root, key)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        path = self._path(Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись во временный файл и переименование: читатель не увидит
+        # недописанный объект.
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, 'wb') as output:
+            if isinstance(Body, bytes):
+                output.write(Body)
+            else:
+                shutil.copyfileobj(Body, output)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        try:
+            body = open(self._path(Key), 'rb')
+        except FileNotFoundError:
+            raise ObjectNotFound(Key)
+        return {'Body': body, 'ContentLength': os.fstat(body.fileno()).st_size}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        try:
+            size = os.path.getsize(self._path(Key))
+        except FileNotFoundError:
+            raise ObjectNotFound(Key)
+        return {'ContentLength': size}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        try:
+            os.remove(self._path(Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+
+def s3_client():
+    """Клиент boto3 для MEDIA_OBJECT_STORE = 'core.storage.s3_client'."""
+    import boto3
+    return boto3.client(
+        's3', endpoint_url=os.getenv('MEDIA_S3_ENDPOINT_URL') or None
+    )
+
+
+class ObjectStorage(Storage):
+    """Хранилище Django поверх S3-совместимого клиента."""
+
+    def __init__(self, client=None, bucket=None):
+        self._client = client
+        self._bucket = bucket
+
+    @cached_property
+    def client(self):
+        return self._client or import_string(settings.MEDIA_OBJECT_STORE)()
+
+    @property
+    def bucket(self):
+        return self._bucket or settings.MEDIA_BUCKET
+
+    def _put(self, name, content):
+        content.seek(0)
+        self.client.put_object(Bucket=self.bucket, Key=name, Body=content)
+
+    def _delete_object(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    def _open(self, name, mode='rb'):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=name)['Body']
+        except Exception as error:
+            if is_missing(error):
+                raise FileNotFoundError(name)
+            raise
+        with body:
+            return File(BytesIO(body.read()), name=name)
+
+    def _save(self, name, content):
+        self._put(name, content)
+        return name
+
+    def delete(self, name):
+        self._delete_object(name)
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=name)
+        except Exception as error:
+            if is_missing(error):
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['ContentLength']
+
+    def url(self, name):
+        return urljoin(settings.MEDIA_URL, filepath_to_uri(name))
+
+
+def content_digest(content):
+    """SHA-256 содержимого файла и его размер; файл читается кусками."""
+    digest = hashlib.sha256()
+    size = 0
+    content.seek(0)
+    for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(ObjectStorage):
+    """Хранилище, где имя загрузки — хэш ее содержимого.
+
+    Имя вида posts/ab/ab12...ef.png: расширение берется из исходного
+    имени, двухсимвольный каталог не дает одному каталогу разрастись.
+    Файлы с другими путями (миниатюры, варианты) хранятся под своими
+    именами, как в ObjectStorage.
+    """
+
+    def _prefix(self, name):
+        for prefix in settings.CONTENT_ADDRESSED_PREFIXES:
+            if name.startswith(prefix):
+                return prefix
+        return None
+
+    @cached_property
+    def _name_re(self):
+        prefixes = '|'.join(
+            re.escape(prefix)
+            for prefix in settings.CONTENT_ADDRESSED_PREFIXES
+        )
+        return re.compile(
+            rf'^(?:{prefixes})([0-9a-f]{{2}})/\1[0-9a-f]{{62}}(\.\w+)?$'
+        )
+
+    def is_content_addressed(self, name):
+        return bool(self._name_re.match(name))
+
+    def content_name(self, name, digest):
+        extension = posixpath.splitext(name)[1].lower()
+        return f'{self._prefix(name)}{digest[:2]}/{digest}{extension}'
+
+    def get_available_name(self, name, max_length=None):
+        # Имя под хэшем выбирает _save; одинаковое содержимое должно
+        # получить одинаковое имя, а не суффикс.
+        if self._prefix(name) is not None:
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if self._prefix(name) is None:
+            return super()._save(name, content)
+        digest, size = content_digest(content)
+        key = self.content_name(name, digest)
+        with transaction.atomic():
+            if Blob.objects.filter(key=key).update(refs=F('refs') + 1):
+                return key
+            self._put(key, content)
+            try:
+                with transaction.atomic():
+                    Blob.objects.create(key=key, refs=1, size=size)
+            except IntegrityError:
+                # Те же байты одновременно сохранил другой запрос.
+                Blob.objects.filter(key=key).update(refs=F('refs') + 1)
+        return key
+
+    def delete(self, name):
+        """Снимает ссылку на файл и удаляет его вместе с последней.
+
+        Файл удаляется внутри транзакции, удалившей Blob: сохранение тех
+        же байтов в это время ждет блокировку строки и затем заливает
+        объект заново. Файлы без Blob (сохраненные до адресации по
+        содержимому) удаляются сразу.
+        """
+        if self._prefix(name) is None:
+            return super().delete(name)
+        with transaction.atomic():
+            referenced = Blob.objects.filter(key=name).update(
+                refs=F('refs') - 1
+            )
+            if referenced and not Blob.objects.filter(
+                key=name, refs=0
+            ).delete()[0]:
+                return
+            self._delete_object(name)
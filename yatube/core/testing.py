@@ -0,0 +1,9 @@
+from django.test import override_settings
+
+# Проверять каждый запрос и превращать нарушения бюджета и N+1 в
+# исключения. Работает как декоратор класса тестов и как контекстный
+# менеджер.
+strict_query_budgets = override_settings(
+    QUERY_INSPECTION_SAMPLE_RATE=1.0,
+    QUERY_INSPECTION_STRICT=True,
+)
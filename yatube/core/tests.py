@@ -0,0 +1,387 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, TestCase, RequestFactory, override_settings
+from django.urls import resolve
+from posts.models import Post
+
+from . import metrics, profiling
+from .db import (
+    ReadReplicaRouter, database_sync_to_async, read_only,
+    watch_request_threads
+)
+from .middleware import (
+    QueryBudgetExceeded, QueryInspectionMiddleware, ReadOnlyViewsMiddleware
+)
+from .models import Blob, RequestProfile
+from .queries import fingerprint, inspect_queries, query_budget
+from .storage import ContentAddressedStorage, LocalObjectStore, is_missing
+from .testing import strict_query_budgets
+
+User = get_user_model()
+
+
+class SqlitePragmasTests(TestCase):
+    def test_connection_uses_tuned_pragmas(self):
+        """Соединение SQLite настраивается при создании."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+class ReadReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+        self.middleware = ReadOnlyViewsMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.middleware.process_view(request, None, (), {})
+        self.seen.append(read_only.get())
+        return HttpResponse()
+
+    def request(self, method, path):
+        request = getattr(self.factory, method)(path)
+        request.resolver_match = resolve(path)
+        self.middleware(request)
+        return self.seen[-1]
+
+    def test_only_reads_of_feed_views_are_marked(self):
+        """Только GET-запросы к лентам помечаются как read-only."""
+        self.assertTrue(self.request('get', '/'))
+        self.assertTrue(self.request('get', '/posts/1/'))
+        self.assertFalse(self.request('post', '/posts/1/comment/'))
+        self.assertFalse(self.request('get', '/create/'))
+        self.assertFalse(read_only.get())
+
+    @mock.patch.dict(settings.DATABASES, {'replica': {}})
+    def test_router_uses_replica_only_for_marked_reads(self):
+        """Роутер читает из replica только в read-only запросе."""
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(None), 'default')
+        token = read_only.set(True)
+        try:
+            self.assertEqual(router.db_for_read(None), 'replica')
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(None), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(Session), 'default')
+        finally:
+            read_only.reset(token)
+
+
+class QueryInspectionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for number in range(3):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'author{number}'),
+                text=f'Пост {number}'
+            )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def inspect(self, view):
+        middleware = QueryInspectionMiddleware(
+            lambda request: self.call_view(middleware, request, view)
+        )
+        request = self.factory.get('/')
+        request.resolver_match = resolve('/')
+        return middleware(request)
+
+    def call_view(self, middleware, request, view):
+        middleware.process_view(request, view, (), {})
+        return view(request)
+
+    def test_fingerprint_ignores_in_list_length(self):
+        """Списки IN разной длины дают одну форму запроса."""
+        self.assertEqual(
+            fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT 1 WHERE id IN (%s)')
+        )
+
+    def test_n_plus_one_points_to_template_line(self):
+        """N+1 находится, и указывается строка шаблона, которая его вызвала."""
+        template = Template(
+            '{% for post in posts %}\n{{ post.author.username }}\n'
+            '{% endfor %}'
+        )
+        with inspect_queries() as log:
+            template.render(Context({'posts': Post.objects.all()}))
+        self.assertEqual(len(log), 4)
+        [(shape, count, origins)] = log.repeated()
+        self.assertIn('auth_user', shape)
+        self.assertEqual(count, 3)
+        self.assertEqual(origins, ['<unknown source>:2'])
+
+    @strict_query_budgets
+    def test_strict_mode_raises_on_exceeded_budget(self):
+        """В строгом режиме превышение бюджета роняет запрос."""
+        @query_budget(1)
+        def view(request):
+            list(Post.objects.all())
+            list(User.objects.all())
+            return HttpResponse()
+
+        with self.assertRaisesMessage(
+            QueryBudgetExceeded, '2 запросов при бюджете 1'
+        ):
+            self.inspect(view)
+
+    @override_settings(
+        QUERY_INSPECTION_SAMPLE_RATE=1.0, QUERY_INSPECTION_STRICT=False
+    )
+    def test_violations_are_logged_in_production(self):
+        """Без строгого режима нарушения пишутся в лог."""
+        def view(request):
+            for post in Post.objects.all():
+                post.author.username
+            return HttpResponse()
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            response = self.inspect(view)
+        self.assertEqual(len(response.query_problems), 1)
+        self.assertIn('N+1: 3 x', logs.output[0])
+
+    @override_settings(QUERY_INSPECTION_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_inspected(self):
+        """Запросы вне выборки не проверяются."""
+        response = self.inspect(query_budget(0)(
+            lambda request: HttpResponse(Post.objects.count())
+        ))
+        self.assertFalse(hasattr(response, 'query_problems'))
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=[])
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные, есть сумма и число."""
+        for seconds in (0.0001, 0.003, 0.003, 20):
+            metrics.observe('test_seconds', seconds, view='posts:index')
+        output = metrics.render()
+        self.assertIn('# TYPE test_seconds histogram', output)
+        for line in (
+            'test_seconds_bucket{view="posts:index",le="0.0005"} 1',
+            'test_seconds_bucket{view="posts:index",le="0.005"} 3',
+            'test_seconds_bucket{view="posts:index",le="10.0"} 3',
+            'test_seconds_bucket{view="posts:index",le="+Inf"} 4',
+            'test_seconds_count{view="posts:index"} 4',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, output)
+
+    def test_request_is_split_by_view(self):
+        """Запрос, SQL, шаблон и кэш замеряются с меткой представления."""
+        Client().get('/')
+        output = Client().get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        for name in (
+            metrics.REQUEST_SECONDS,
+            metrics.SQL_SECONDS,
+            metrics.TEMPLATE_SECONDS,
+            metrics.CACHE_SECONDS,
+        ):
+            with self.subTest(name=name):
+                self.assertIn(f'{name}_count{{view="posts:index"}} ', output)
+
+    def test_metrics_require_token_or_allowed_address(self):
+        """Метрики закрыты без токена, даже для 127.0.0.1 за прокси."""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = Client().get('/metrics/', **headers)
+                self.assertEqual(response.status_code, 404)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            response = Client(REMOTE_ADDR='10.0.0.1').get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+
+
+PROFILES_DIR = tempfile.mkdtemp()
+
+
+def busy_view():
+    time.sleep(0.02)
+
+
+@override_settings(PROFILES_DIR=PROFILES_DIR, PROFILING_SAMPLE_RATE=0.0)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILES_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_sampler_collects_collapsed_stacks(self):
+        """Снимки стека сворачиваются в строки от корня к вершине."""
+        with profiling.StackSampler(0.001) as sampler:
+            busy_view()
+        self.assertTrue(sampler.stacks)
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertIn(';busy_view (core/tests.py:', stack)
+
+    def test_signed_token_profiles_request(self):
+        """Запрос с подписанным токеном профилируется, токен не хранится."""
+        response = Client().get(
+            '/', {'profile': profiling.make_token(), 'page': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.path, '/?page=2')
+        self.assertEqual(profile.view_name, 'posts:index')
+        self.assertEqual(profile.trigger, RequestProfile.TRIGGER_TOKEN)
+        self.assertTrue(
+            os.path.exists(profiling.profile_path(profile.filename))
+        )
+
+    def test_bad_token_is_ignored(self):
+        """Без верной подписи запрос не профилируется."""
+        Client().get('/', HTTP_X_PROFILE='profile:forged:token')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_ring_buffer_drops_oldest_profiles(self):
+        """Хранятся только последние профили, файлы старых удаляются."""
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        profiles = [
+            profiling.save_profile(request, Counter({'a;b': 1}), 0.1, 'sample')
+            for _ in range(3)
+        ]
+        profiling.prune(keep=2)
+        self.assertEqual(
+            list(RequestProfile.objects.all()), profiles[:0:-1]
+        )
+        self.assertFalse(
+            os.path.exists(profiling.profile_path(profiles[0].filename))
+        )
+
+    def test_admin_shows_and_serves_profile(self):
+        """Профили видны в админке и скачиваются для flamegraph."""
+        request = RequestFactory().get('/posts/1/')
+        request.resolver_match = resolve('/posts/1/')
+        profile = profiling.save_profile(
+            request, Counter({'main;post_detail': 5}), 0.2, 'token'
+        )
+        changelist = self.client.get(
+            '/admin/core/requestprofile/'
+        ).content.decode()
+        self.assertIn('?profile=', changelist)
+        self.assertIn('/posts/1/', changelist)
+        detail = self.client.get(
+            f'/admin/core/requestprofile/{profile.pk}/change/'
+        ).content.decode()
+        self.assertIn('main;post_detail 5', detail)
+        download = self.client.get(
+            f'/admin/core/requestprofile/{profile.pk}/download/'
+        )
+        self.assertEqual(
+            b''.join(download.streaming_content), b'main;post_detail 5\n'
+        )
+
+
+class DatabasePoolTests(TestCase):
+    @override_settings(ASYNC_DB_WORKERS=2)
+    @mock.patch('core.db._runs_inline', return_value=False)
+    def test_pool_threads_are_watched(self, runs_inline):
+        """Код уходит в пул потоков, и наблюдатели запроса видят поток."""
+        class Watcher:
+            thread_ids = []
+
+            @contextmanager
+            def watch_thread(self):
+                self.thread_ids.append(threading.get_ident())
+                yield
+
+        watcher = Watcher()
+
+        async def run():
+            with watch_request_threads(watcher):
+                return await database_sync_to_async(threading.get_ident)()
+
+        thread_id = async_to_sync(run)()
+        self.assertNotEqual(thread_id, threading.get_ident())
+        self.assertEqual(watcher.thread_ids, [thread_id])
+
+
+MEDIA_DIR = tempfile.mkdtemp()
+
+
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = LocalObjectStore(MEDIA_DIR)
+        self.storage = ContentAddressedStorage(client=self.client)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые загрузки получают одно имя и делят файл."""
+        first = self.storage.save('posts/a.GIF', ContentFile(b'GIF89a'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'GIF89a'))
+        self.assertEqual(first, second)
+        self.assertTrue(self.storage.is_content_addressed(first))
+        self.assertTrue(first.endswith('.gif'))
+        self.assertEqual(Blob.objects.get(key=first).refs, 2)
+        self.assertEqual(self.storage.size(first), 6)
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется, только когда на него не осталось ссылок."""
+        name = self.storage.save('posts/a.gif', ContentFile(b'shared'))
+        self.storage.save('posts/b.gif', ContentFile(b'shared'))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_other_names_are_kept(self):
+        """Файлы вне адресуемых каталогов хранятся под своими именами."""
+        name = self.storage.save('cache/a.gif', ContentFile(b'thumb'))
+        self.assertEqual(name, 'cache/a.gif')
+        self.assertNotEqual(
+            self.storage.save('cache/a.gif', ContentFile(b'thumb')), name
+        )
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'thumb')
+        self.assertFalse(Blob.objects.exists())
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_missing_object(self):
+        """Отсутствующий объект — ошибка клиента с кодом NoSuchKey."""
+        with self.assertRaises(Exception) as raised:
+            self.client.get_object(Bucket='yatube', Key='posts/none.gif')
+        self.assertTrue(is_missing(raised.exception))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.open('posts/none.gif')
@@ -1,6 +1,33 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
-from .models import Post, Group, Comment, Follow
+from .export import EXPORT_FORMATS, export_lines
+from .models import (
+    Post, Group, Comment, Follow, AuthorStats, Notification
+)
+
+
+def export_action(format_name):
+    """Действие админки, потоково отдающее выбранные строки файлом."""
+    export_format = EXPORT_FORMATS[format_name]
+
+    def export(modeladmin, request, queryset):
+        response = StreamingHttpResponse(
+            export_lines(queryset, export_format),
+            content_type=export_format.content_type
+        )
+        filename = f'{queryset.model._meta.model_name}.{format_name}'
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
+    export.__name__ = f'export_{format_name}'
+    export.short_description = f'Выгрузить в {format_name.upper()}'
+    return export
+
+
+EXPORT_ACTIONS = [export_action(name) for name in EXPORT_FORMATS]
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +36,7 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -21,15 +49,39 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'post', 'author')
     search_fields = ('text',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
     search_fields = ('author',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS
+
+
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'comments_count',
+        'followers_count',
+        'following_count'
+    )
+    search_fields = ('user__username',)
+    readonly_fields = list_display
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'kind', 'post', 'actor', 'count', 'read')
+    list_filter = ('kind', 'read')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'post', 'actor')
+    empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(AuthorStats, AuthorStatsAdmin)
+admin.site.register(Notification, NotificationAdmin)
@@ -0,0 +1,314 @@
+"""Нагрузочные замеры представлений приложения posts.
+
+Синтетический набор данных заводится импортом, поэтому счетчики, ленты
+подписок и поисковый индекс в нем такие же, как у живых данных. Граф
+подписок степенной: немногие авторы собирают большинство подписчиков и
+уходят в pull-режим ленты. Каждый адрес из posts/urls.py опрашивается
+тестовым клиентом, результаты сохраняются в JSON и сравниваются с
+базовыми.
+"""
+import json
+import platform
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import django
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from core.queries import inspect_queries
+
+from . import counters, feed
+from .importer import Importer
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .urls import app_name, urlpatterns
+
+Scale = namedtuple(
+    'Scale', 'users groups posts comments follows_per_user'
+)
+
+BENCHMARK_SCALES = {
+    'small': Scale(500, 20, 10_000, 20_000, 20),
+    'large': Scale(20_000, 200, 1_000_000, 2_000_000, 20),
+}
+BENCHMARK_REQUESTS: int = 50
+BENCHMARK_TOLERANCE: float = 0.2
+FOLLOW_EXPONENT: float = 1.2
+GROUP_SHARE: float = 0.7
+SEED_DAYS: int = 365
+SEED_BATCH_SIZE: int = 1000
+PERCENTILES = (50, 95, 99)
+FORM_TYPE = 'application/x-www-form-urlencoded'
+
+
+def power_law_weights(count, exponent=FOLLOW_EXPONENT):
+    """Веса Ципфа для count элементов: вес ранга r равен 1 / r ** exponent."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _seed_users(scale):
+    users = User.objects.bulk_create(
+        [User(username=f'user{number}') for number in range(scale.users)],
+        batch_size=SEED_BATCH_SIZE
+    )
+    if users[0].pk is None:
+        users = list(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).order_by('pk'))
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user=user) for user in users],
+        batch_size=SEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return users
+
+
+def _seed_follows(users, scale, rng):
+    weights = power_law_weights(len(users))
+    follows = []
+    for user in users:
+        authors = set(rng.choices(
+            users, weights, k=rng.randint(1, 2 * scale.follows_per_user)
+        ))
+        authors.discard(user)
+        follows.extend(Follow(user=user, author=author) for author in authors)
+    Follow.objects.bulk_create(follows, batch_size=SEED_BATCH_SIZE)
+    feed.reset_pull_modes()
+
+
+def _post_records(users, groups, scale, rng, fake):
+    now = timezone.now()
+    for _ in range(scale.posts):
+        yield 0, {
+            'author': rng.choice(users).username,
+            'group': (
+                rng.choice(groups).slug if rng.random() < GROUP_SHARE
+                else None
+            ),
+            'text': fake.paragraph(nb_sentences=rng.randint(1, 12)),
+            'pub_date': (
+                now - timedelta(seconds=rng.randint(0, SEED_DAYS * 86400))
+            ).isoformat(),
+        }
+
+
+def _comment_records(users, scale, rng, fake):
+    first, last = (
+        Post.objects.order_by('pk').first().pk,
+        Post.objects.order_by('pk').last().pk
+    )
+    # Комментарии тоже степенные: обсуждают в основном немногие посты.
+    weights = power_law_weights(last - first + 1)
+    post_ids = range(first, last + 1)
+    for post_id in rng.choices(post_ids, weights, k=scale.comments):
+        yield 0, {
+            'post': post_id,
+            'author': rng.choice(users).username,
+            'text': fake.sentence(),
+        }
+
+
+def seed(scale, random_seed=0):
+    """Заполняет пустую базу синтетическими данными масштаба scale."""
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    users = _seed_users(scale)
+    groups = Group.objects.bulk_create([
+        Group(
+            title=fake.catch_phrase(),
+            slug=f'group{number}',
+            description=fake.paragraph()
+        )
+        for number in range(scale.groups)
+    ])
+    _seed_follows(users, scale, rng)
+    for model, records in (
+        (Post, _post_records(users, groups, scale, rng, fake)),
+        (Comment, _comment_records(users, scale, rng, fake)),
+    ):
+        for _ in Importer(model, SEED_BATCH_SIZE).run(records):
+            pass
+    counters.reconcile_users()
+    cache.clear()
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _samples():
+    """Объекты, на которых опрашиваются адреса с параметрами.
+
+    Берутся самые нагруженные: пост с наибольшим числом комментариев,
+    автор с наибольшим числом подписчиков и самая большая группа.
+    Читатель — автор этого поста, чтобы правка поста не уводила на
+    редирект.
+    """
+    post = Post.objects.select_related('author').order_by(
+        '-comments_count', 'pk'
+    ).first()
+    author = User.objects.annotate(
+        followers=Count('following')
+    ).order_by('-followers', 'pk').first()
+    group = Group.objects.annotate(
+        posts_count=Count('posts')
+    ).order_by('-posts_count', 'pk').first()
+    kwargs = {
+        'post_id': post.pk,
+        'username': author.username,
+        'slug': group.slug,
+    }
+    word = post.text.split()[0].strip('.,!?')
+    return post.author, kwargs, {'search': {'q': word}}
+
+
+def targets():
+    """Запросы (имя, метод, адрес, данные) по всем адресам posts/urls.py."""
+    reader, kwargs, params = _samples()
+    requests = []
+    for pattern in urlpatterns:
+        name = pattern.name
+        missing = set(pattern.pattern.converters) - set(kwargs)
+        if missing:
+            raise ValueError(
+                f'Нет значения для {", ".join(sorted(missing))} '
+                f'в адресе {name}'
+            )
+        path = reverse(f'{app_name}:{name}', kwargs={
+            key: kwargs[key] for key in pattern.pattern.converters
+        })
+        if name == 'add_comment':
+            requests.append((name, 'post', path, {'text': 'Замер'}))
+        else:
+            requests.append((name, 'get', path, params.get(name, {})))
+    return reader, requests
+
+
+def _sender(client, method):
+    """Функция (адрес, данные) -> ответ для клиента и метода.
+
+    Формы уходят как application/x-www-form-urlencoded: AsyncClient в
+    Django 3.2 не дочитывает multipart-тело запроса.
+    """
+    request = getattr(client, method)
+
+    def send(path, data):
+        if method == 'post':
+            return request(path, urlencode(data), content_type=FORM_TYPE)
+        return request(path, data)
+
+    if not isinstance(client, AsyncClient):
+        return send
+
+    async def send_async(path, data):
+        return await send(path, data)
+
+    return async_to_sync(send_async)
+
+
+def _allocated(client, method, path, data):
+    tracemalloc.start()
+    try:
+        _sender(client, method)(path, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(client, method, path, data, repeat, cold=False):
+    """Задержки, число запросов к базе и пик памяти одного адреса."""
+    send = _sender(client, method)
+    timings, queries, statuses = [], [], set()
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with inspect_queries() as log:
+            started = time.perf_counter()
+            response = send(path, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(log))
+        statuses.add(response.status_code)
+    if cold:
+        cache.clear()
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent), 3)
+        for percent in PERCENTILES
+    }
+    result.update(
+        queries=max(queries),
+        allocated_kb=round(_allocated(client, method, path, data) / 1024, 1),
+        statuses=sorted(statuses),
+    )
+    return result
+
+
+def run(repeat=BENCHMARK_REQUESTS, cold=False, asgi=False):
+    """Замеряет все адреса posts/urls.py, возвращает отчет для JSON.
+
+    С asgi=True запросы идут через ASGI-обработчик, как под uvicorn.
+    """
+    reader, requests = targets()
+    client = AsyncClient() if asgi else Client()
+    client.force_login(reader)
+    views = {
+        name: measure(client, method, path, data, repeat, cold)
+        for name, method, path, data in requests
+    }
+    return {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'posts': Post.objects.count(),
+        'requests': repeat,
+        'cold': cold,
+        'interface': 'asgi' if asgi else 'wsgi',
+        'views': views,
+    }
+
+
+def compare(report, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Регрессии отчета относительно базового.
+
+    Регрессия — рост p95 больше чем на долю tolerance или любой рост
+    числа запросов к базе.
+    """
+    regressions = []
+    for name, result in report['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс'
+            )
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}'
+            )
+    return regressions
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
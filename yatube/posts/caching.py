@@ -0,0 +1,188 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .paginator import paginator, page_state, restore_page
+
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 24
+REBUILD_LOCK_TIMEOUT: int = 10
+GLOBAL_SCOPE = 'posts'
+# Данные всех групп: от них зависят ссылки на группы в лентах авторов.
+GROUPS_SCOPE = 'groups'
+
+
+def timeout(seconds=FEED_CACHE_TIMEOUT):
+    """Срок жизни записи кэша; None — бессрочно.
+
+    Кэш в памяти процесса не видит сбросов из других процессов, поэтому
+    его записи живут не дольше LOCAL_CACHE_TIMEOUT секунд.
+    """
+    if not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return seconds
+    if seconds is None:
+        return settings.LOCAL_CACHE_TIMEOUT
+    return min(seconds, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def group_info_scope(group_id):
+    return f'group_info:{group_id}'
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
+
+
+def notifications_scope(user_id):
+    return f'notifications:{user_id}'
+
+
+def _version_key(scope):
+    return f'feed_version:{scope}'
+
+
+def _modified_key(scope):
+    return f'feed_modified:{scope}'
+
+
+def get_versions(*scopes):
+    """Текущие поколения областей кэша.
+
+    Пропавшее из кэша поколение заводится заново от текущего времени,
+    чтобы не совпасть ни с одним из ранее выданных значений.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout(None))
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сбрасывает все страницы, закэшированные в указанных областях."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout(None))
+    now = time.time()
+    cache.set_many(
+        {_modified_key(scope): now for scope in scopes}, timeout(None)
+    )
+
+
+def bump_on_commit(*scopes):
+    """bump после коммита текущей транзакции.
+
+    До коммита параллельный запрос может собрать страницу из старых
+    данных и положить ее в кэш под новым поколением.
+    """
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def last_modified(*scopes):
+    """Время последнего изменения областей.
+
+    Если отметка пропала из кэша, изменение считается случившимся сейчас.
+    """
+    keys = [_modified_key(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, now, timeout(None))
+            stamps[key] = cache.get(key, now)
+    return datetime.fromtimestamp(max(stamps.values()), tz=timezone.utc)
+
+
+def etag(request, *scopes):
+    """Сильный ETag ответа, который зависит только от областей и адреса."""
+    raw = f'{scopes}|{get_versions(*scopes)}|{request.get_full_path()}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _id_key(model, value):
+    digest = hashlib.md5(str(value).encode()).hexdigest()
+    return f'id_of:{model._meta.label_lower}:{digest}'
+
+
+def resolve_id(model, field, value):
+    """Первичный ключ объекта по уникальному полю, запомненный в кэше."""
+    key = _id_key(model, value)
+    pk = cache.get(key)
+    if pk is None:
+        pk = model.objects.filter(
+            **{field: value}
+        ).values_list('pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, timeout())
+    return pk
+
+
+def forget_id(model, value):
+    cache.delete(_id_key(model, value))
+
+
+def _page_key(request, scopes, versions):
+    params = request.GET.urlencode()
+    raw = f'{scopes}|{versions}|{params}'.encode()
+    return 'feed_page:' + hashlib.md5(raw).hexdigest()
+
+
+def cached_paginator(request, posts, *scopes):
+    """Страница ленты из кэша, действующая до изменения ее областей.
+
+    Пока одна копия приложения пересобирает страницу, остальные отдают
+    последнюю собранную версию, а не идут в базу одновременно.
+    """
+    key = _page_key(request, scopes, get_versions(*scopes))
+    state = cache.get(key)
+    if state is not None:
+        return restore_page(state)
+    stale_key = _page_key(request, scopes, None)
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        state = cache.get(stale_key)
+        if state is not None:
+            return restore_page(state)
+    page = paginator(request, posts)
+    state = page_state(page)
+    cache.set_many({key: state, stale_key: state}, timeout())
+    cache.delete(lock_key)
+    return page
+
+
+def card_key(post, *variant):
+    """Ключ отрендеренной карточки поста.
+
+    Карточка зависит от самого поста, имени автора и данных группы,
+    поэтому ключ включает поколения всех трех областей.
+    """
+    scopes = [post_scope(post.pk), user_scope(post.author_id)]
+    if post.group_id is not None:
+        scopes.append(group_info_scope(post.group_id))
+    parts = [*variant, *get_versions(*scopes)]
+    return f'post_card:{post.pk}:' + '-'.join(map(str, parts))
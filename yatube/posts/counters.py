@@ -0,0 +1,88 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+RECONCILE_BATCH_SIZE: int = 1000
+STATS_FIELDS = (
+    'posts_count',
+    'comments_count',
+    'followers_count',
+    'following_count',
+)
+
+
+def stats_for(user):
+    """Счетчики пользователя; для пользователя без строки — нули."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def _shifted(delta, field):
+    return {field: Greatest(F(field) + delta, 0)}
+
+
+def shift_user(user_id, field, delta):
+    """Атомарно сдвигает счетчик пользователя на delta.
+
+    Строка счетчиков заводится при создании пользователя; если ее нет,
+    расхождение исправит команда reconcile_counters.
+    """
+    AuthorStats.objects.filter(user_id=user_id).update(
+        **_shifted(delta, field)
+    )
+
+
+def shift_post(post_id, delta):
+    """Атомарно сдвигает счетчик комментариев поста на delta."""
+    Post.objects.filter(pk=post_id).update(
+        **_shifted(delta, 'comments_count')
+    )
+
+
+def _count_of(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def reconcile_users():
+    """Пересчитывает счетчики пользователей, возвращает число исправленных."""
+    fixed = 0
+    users = User.objects.annotate(
+        real_posts_count=_count_of(Post, 'author'),
+        real_comments_count=_count_of(Comment, 'author'),
+        real_followers_count=_count_of(Follow, 'author'),
+        real_following_count=_count_of(Follow, 'user'),
+    ).select_related('stats').order_by('pk')
+    for user in users.iterator(chunk_size=RECONCILE_BATCH_SIZE):
+        stats = stats_for(user)
+        real = {
+            field: getattr(user, 'real_' + field) for field in STATS_FIELDS
+        }
+        if stats.pk is not None and all(
+            getattr(stats, field) == value for field, value in real.items()
+        ):
+            continue
+        AuthorStats.objects.update_or_create(user=user, defaults=real)
+        fixed += 1
+    return fixed
+
+
+def reconcile_posts():
+    """Пересчитывает счетчики комментариев, возвращает число исправленных."""
+    fixed = 0
+    posts = Post.objects.annotate(
+        real_comments_count=_count_of(Comment, 'post')
+    ).exclude(
+        comments_count=F('real_comments_count')
+    ).only('pk', 'comments_count')
+    for post in posts.iterator(chunk_size=RECONCILE_BATCH_SIZE):
+        Post.objects.filter(pk=post.pk).update(
+            comments_count=post.real_comments_count
+        )
+        fixed += 1
+    return fixed
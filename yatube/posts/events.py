@@ -0,0 +1,210 @@
+"""Уведомления о новых постах лент через server-sent events.
+
+Новый пост публикуется брокером core.pubsub в каналы общей ленты, своей
+группы и своего автора. Лента подписок слушает каналы авторов, на
+которых подписан пользователь, и его собственный канал подписок: после
+подписки или отписки поток закрывается, и браузер переподключается уже
+к новому списку авторов. Django 3.2 отдает потоковые ответы под
+ASGI синхронным итератором, поэтому потоки событий обслуживает
+EventStreamRouter в обход обработчика Django, а не представления.
+"""
+import asyncio
+import json
+from functools import partial
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import PermissionDenied
+from django.http import parse_cookie
+from django.urls import Resolver404, resolve
+
+from core.db import database_sync_to_async
+from core.pubsub import broker
+
+from . import caching
+from .models import Follow, Group, User
+from .urls import app_name
+
+GLOBAL_CHANNEL = 'feed'
+EVENT_NAME = 'post'
+RESUBSCRIBE = {'resubscribe': True}
+HEARTBEAT_SECONDS: int = 15
+RETRY_MS: int = 5000
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def group_channel(group_id):
+    return f'feed:group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'feed:author:{author_id}'
+
+
+def follows_channel(user_id):
+    return f'follows:{user_id}'
+
+
+def publish_post(post):
+    """Сообщает лентам поста о его появлении."""
+    channels = [GLOBAL_CHANNEL, author_channel(post.author_id)]
+    if post.group_id is not None:
+        channels.append(group_channel(post.group_id))
+    for channel in channels:
+        broker.publish(channel, {'id': post.pk})
+
+
+def publish_follows_changed(user_id):
+    """Просит открытые ленты подписок читателя переподключиться."""
+    broker.publish(follows_channel(user_id), RESUBSCRIBE)
+
+
+def scope_user(scope):
+    """Пользователь из куки сессии запроса ASGI."""
+    headers = dict(scope.get('headers', ()))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return get_user(SimpleNamespace(session=session))
+
+
+def _global_channels(scope):
+    return [GLOBAL_CHANNEL]
+
+
+def _group_channels(scope, slug):
+    group_id = caching.resolve_id(Group, 'slug', slug)
+    return None if group_id is None else [group_channel(group_id)]
+
+
+def _author_channels(scope, username):
+    author_id = caching.resolve_id(User, 'username', username)
+    return None if author_id is None else [author_channel(author_id)]
+
+
+def _follow_channels(scope):
+    user = scope_user(scope)
+    if not user.is_authenticated:
+        raise PermissionDenied
+    return [follows_channel(user.pk)] + [
+        author_channel(author_id)
+        for author_id in Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        )
+    ]
+
+
+# Каналы потоков по именам адресов posts/urls.py. Функции получают
+# scope запроса и аргументы адреса и возвращают None, если ленты нет.
+STREAMS = {
+    'events': _global_channels,
+    'group_events': _group_channels,
+    'profile_events': _author_channels,
+    'follow_events': _follow_channels,
+}
+
+
+def format_event(message):
+    return (
+        f'event: {EVENT_NAME}\nid: {message["id"]}\n'
+        f'data: {json.dumps(message)}\n\n'
+    ).encode()
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _respond(send, status):
+    await send({'type': 'http.response.start', 'status': status})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def serve_stream(get_channels, scope, receive, send):
+    """Отдает поток событий, пока клиент не отключится.
+
+    Раз в HEARTBEAT_SECONDS без событий уходит комментарий: так прокси
+    не закрывают соединение, а отключение клиента замечается вовремя.
+    Каналы выбираются один раз при подключении; событие RESUBSCRIBE
+    завершает ответ, и EventSource через RETRY_MS выбирает их заново.
+    """
+    try:
+        channels = await database_sync_to_async(get_channels)(scope)
+    except PermissionDenied:
+        return await _respond(send, 403)
+    if channels is None:
+        return await _respond(send, 404)
+    async with broker.subscribe(channels) as subscription:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': STREAM_HEADERS,
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+        disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+        event = None
+        try:
+            while True:
+                if event is None:
+                    event = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {event, disconnect},
+                    timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnect in done:
+                    break
+                if event in done:
+                    message, event = event.result(), None
+                    if message == RESUBSCRIBE:
+                        await send({'type': 'http.response.body'})
+                        break
+                    body = format_event(message)
+                else:
+                    body = b':\n\n'
+                await send({
+                    'type': 'http.response.body',
+                    'body': body,
+                    'more_body': True,
+                })
+        finally:
+            disconnect.cancel()
+            if event is not None:
+                event.cancel()
+
+
+def match_stream(scope):
+    """Функция каналов для запроса к потоку событий или None."""
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        return None
+    try:
+        match = resolve(scope['path'])
+    except Resolver404:
+        return None
+    if match.namespace != app_name or match.url_name not in STREAMS:
+        return None
+    return partial(STREAMS[match.url_name], **match.kwargs)
+
+
+class EventStreamRouter:
+    """ASGI-приложение: потоки событий отдает само, остальное — Django."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        get_channels = match_stream(scope)
+        if get_channels is None:
+            return await self.application(scope, receive, send)
+        await serve_stream(get_channels, scope, receive, send)
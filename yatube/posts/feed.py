@@ -0,0 +1,190 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, connections, transaction
+from django.db.models import Count
+
+from .models import POST_CARD_FIELDS, AuthorStats, FeedEntry, Follow, Post
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+FANOUT_FOLLOWERS_LIMIT: int = 5000
+FEED_BACKFILL_LIMIT: int = 1000
+FEED_BATCH_SIZE: int = 1000
+
+_executor = None
+
+
+def pull_author_ids(author_ids):
+    """Авторы из author_ids, чьи посты не раскладываются по лентам.
+
+    Это авторы, у которых больше FANOUT_FOLLOWERS_LIMIT подписчиков: их
+    посты читаются при показе ленты. Режим хранится в
+    AuthorStats.pull_mode и переключается update_pull_mode.
+    """
+    return set(AuthorStats.objects.filter(
+        user_id__in=author_ids, pull_mode=True
+    ).values_list('user_id', flat=True))
+
+
+def _entries_for(post, user_ids):
+    return [
+        FeedEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        )
+        for user_id in user_ids
+    ]
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """Раскладывает новые посты по лентам подписчиков их авторов."""
+    author_ids = pull_author_ids({post.author_id for post in posts})
+    posts = [post for post in posts if post.author_id not in author_ids]
+    if not posts:
+        return
+    followers = {}
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in={post.author_id for post in posts}
+    ).values_list('author_id', 'user_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    FeedEntry.objects.bulk_create(
+        [
+            entry
+            for post in posts
+            for entry in _entries_for(post, followers.get(post.author_id, []))
+        ],
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_follow(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    if pull_author_ids([author_id]):
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'pub_date', 'author_id'
+    )[:FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        [entry for post in posts for entry in _entries_for(post, [user_id])],
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_author(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков."""
+    if pull_author_ids([author_id]):
+        return
+    posts = list(Post.objects.filter(author_id=author_id).only(
+        'id', 'pub_date', 'author_id'
+    )[:FEED_BACKFILL_LIMIT])
+    if not posts:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).iterator()
+    # Подписчики берутся порциями, чтобы не держать в памяти записи для
+    # всех сразу.
+    chunk_size = max(FEED_BATCH_SIZE // len(posts), 1)
+    for user_ids in chunked(follower_ids, chunk_size):
+        FeedEntry.objects.bulk_create(
+            [
+                entry for post in posts
+                for entry in _entries_for(post, user_ids)
+            ],
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def _runs_inline():
+    """Поток раскладки не видит базу SQLite в памяти: она у каждого своя."""
+    return connection.vendor == 'sqlite' and connection.is_in_memory_db()
+
+
+def _backfill_in_background(author_id):
+    try:
+        backfill_author(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        connections.close_all()
+
+
+def _schedule_backfill(author_id):
+    global _executor
+    if _runs_inline():
+        backfill_author(author_id)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='feed'
+        )
+    _executor.submit(_backfill_in_background, author_id)
+
+
+def drop_follow(user_id, author_id):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def update_pull_mode(author_id):
+    """Переключает автора между раскладкой по лентам и чтением при показе.
+
+    Режим сверяется с AuthorStats.followers_count условными UPDATE в той
+    же транзакции, что и сдвиг счетчика, поэтому переключение видит
+    ровно один запрос. Вернувшегося к раскладке автора его посты
+    раскладываются по лентам подписчиков после коммита и вне запроса.
+    """
+    stats = AuthorStats.objects.filter(user_id=author_id)
+    stats.filter(
+        pull_mode=False, followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+    ).update(pull_mode=True)
+    if stats.filter(
+        pull_mode=True, followers_count__lte=FANOUT_FOLLOWERS_LIMIT
+    ).update(pull_mode=False):
+        transaction.on_commit(lambda: _schedule_backfill(author_id))
+
+
+def reset_pull_modes():
+    """Выбирает режим всех авторов заново по таблице подписок.
+
+    Нужна после загрузки подписок мимо сигналов; ленты не дописывает.
+    """
+    popular = Follow.objects.values('author').annotate(
+        followers=Count('id')
+    ).filter(followers__gt=FANOUT_FOLLOWERS_LIMIT).values('author')
+    AuthorStats.objects.filter(user_id__in=popular).update(pull_mode=True)
+    AuthorStats.objects.exclude(user_id__in=popular).update(pull_mode=False)
+
+
+def follow_feed(user):
+    """Источники ленты подписок: записи ленты и посты авторов в pull-режиме.
+
+    Для пользователя без подписок на таких авторов вторым элементом
+    возвращается None, и лента читается одним диапазоном по индексу.
+    """
+    entries = FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).only('post', *[f'post__{field}' for field in POST_CARD_FIELDS])
+    pulled_ids = list(Follow.objects.filter(
+        user=user,
+        author_id__in=AuthorStats.objects.filter(
+            pull_mode=True
+        ).values('user_id')
+    ).values_list('author_id', flat=True))
+    if not pulled_ids:
+        return entries, None
+    entries = entries.exclude(author_id__in=pulled_ids)
+    pulled = Post.feed.filter(author_id__in=pulled_ids)
+    return entries, pulled
@@ -0,0 +1,43 @@
+"""Области кэша, от которых зависят страницы и ответы API.
+
+По версиям этих областей вычисляются ETag и Last-Modified условных
+GET-запросов, поэтому функции не должны обращаться к базе, кроме
+редкого разрешения slug или имени пользователя в первичный ключ.
+"""
+from . import caching
+from .models import Group, User
+
+
+def index_scopes(request):
+    return [caching.GLOBAL_SCOPE]
+
+
+def post_scopes(request, post_id):
+    return [caching.GLOBAL_SCOPE, caching.post_scope(post_id)]
+
+
+def group_scopes(request, slug):
+    group_id = caching.resolve_id(Group, 'slug', slug)
+    if group_id is None:
+        return None
+    return [
+        caching.group_scope(group_id),
+        caching.group_info_scope(group_id)
+    ]
+
+
+def profile_scopes(request, username):
+    author_id = caching.resolve_id(User, 'username', username)
+    if author_id is None:
+        return None
+    return [
+        caching.author_scope(author_id),
+        caching.following_scope(author_id),
+        caching.GROUPS_SCOPE
+    ]
+
+
+def follow_scopes(request):
+    if not request.user.is_authenticated:
+        return None
+    return [caching.GLOBAL_SCOPE, caching.following_scope(request.user.pk)]
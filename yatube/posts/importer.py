@@ -0,0 +1,351 @@
+"""Массовый импорт постов и комментариев из NDJSON или CSV.
+
+Записи читаются потоком и вставляются пачками через bulk_create, каждая
+пачка — в своей транзакции. bulk_create не вызывает сигналы, поэтому
+счетчики, ленты подписок, поисковый индекс и поколения кэша
+обновляются здесь же, один раз на пачку.
+"""
+import csv
+import gzip
+import json
+import os
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, feed, media, search
+from .models import Comment, Group, Post, User, text_preview
+from .utils import chunked
+
+IMPORT_BATCH_SIZE: int = 1000
+IMAGE_WORKERS: int = 8
+IMAGE_UPLOAD_TO = 'posts/'
+
+# Имена колонок выгрузки export_data, которые понимает импорт.
+FIELD_ALIASES = {
+    'author__username': 'author',
+    'group__slug': 'group',
+    'post_id': 'post',
+}
+
+
+class RecordError(Exception):
+    """Запись нельзя импортировать."""
+
+
+def read_records(path, file_format=None):
+    """Пары (номер строки, запись) из файла NDJSON или CSV.
+
+    Формат определяется по расширению, файлы .gz распаковываются на лету.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else open
+    if file_format is None:
+        file_format = 'csv' if name.endswith('.csv') else 'ndjson'
+    with opener(path, 'rt', encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            for number, record in enumerate(csv.DictReader(source), 2):
+                yield number, record
+            return
+        for number, line in enumerate(source, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def _normalized(record):
+    return {
+        FIELD_ALIASES.get(key, key): value if value != '' else None
+        for key, value in record.items()
+    }
+
+
+def _parse_id(value, label):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'некорректный {label} {value!r}')
+
+
+def _parse_date(value):
+    if value is None:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'некорректная дата {value!r}')
+    return date
+
+
+@contextmanager
+def _keeping_dates(field):
+    """Отключает auto_now_add поля на время вставки пачки.
+
+    Даты из записей тогда пишутся той же вставкой, без второго UPDATE.
+    Импорт запускается командой, и другие сохранения моделей в ее
+    процессе идут не параллельно с ним.
+    """
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _run_now(function, *args):
+    """Выполняет функцию сразу и возвращает Future с ее результатом."""
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+class Importer:
+    """Импорт записей одной модели пачками по batch_size.
+
+    Авторы и группы разрешаются по username и slug через словари в
+    памяти, недостающие ключи дочитываются одним запросом на пачку.
+    Картинки копируются из images_dir в хранилище параллельно.
+    """
+
+    def __init__(self, model, batch_size=IMPORT_BATCH_SIZE, images_dir=None,
+                 workers=IMAGE_WORKERS):
+        self.model = model
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.user_ids = {}
+        self.group_ids = {}
+        self.post_ids = set()
+        self.errors = []
+
+    def close(self):
+        self.executor.shutdown()
+
+    def _resolve(self, cache, model, field, keys):
+        missing = {key for key in keys if key and key not in cache}
+        if missing:
+            cache.update(model.objects.filter(
+                **{f'{field}__in': missing}
+            ).values_list(field, 'pk'))
+
+    def _lookup(self, cache, key, label):
+        if key not in cache:
+            raise RecordError(f'неизвестный {label} {key!r}')
+        return cache[key]
+
+    def _copy_image(self, name):
+        root = os.path.realpath(self.images_dir)
+        source = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, source]) != root:
+            raise RecordError(f'картинка {name!r} вне каталога импорта')
+        with open(source, 'rb') as image:
+            return default_storage.save(
+                IMAGE_UPLOAD_TO + os.path.basename(name), File(image)
+            )
+
+    def _copy_images(self, posts):
+        """Копирует картинки валидных постов пачки параллельно.
+
+        Посты, чью картинку скопировать не удалось, отбрасываются.
+        """
+        if not self.images_dir:
+            return posts
+        # Хранилище считает ссылки на файлы в базе, а запись в базу SQLite
+        # в памяти из других потоков упирается в блокировку таблицы.
+        submit = self.executor.submit
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            submit = _run_now
+        futures = {
+            number: submit(self._copy_image, post.image.name)
+            for number, post in posts if post.image
+        }
+        copied = []
+        for number, post in posts:
+            if number in futures:
+                try:
+                    post.image = futures[number].result()
+                except (OSError, RecordError) as error:
+                    self.errors.append((number, error))
+                    continue
+            copied.append((number, post))
+        return copied
+
+    def _release_images(self, posts):
+        """Отпускает картинки постов пачки, которая не вставилась.
+
+        Хранилище засчитало ссылки на них еще при копировании, вне
+        транзакции пачки.
+        """
+        for post in posts:
+            if post.image:
+                media.release_image(post.image.name)
+
+    def _build_post(self, record):
+        text = record.get('text') or ''
+        return Post(
+            id=_parse_id(record.get('id'), 'id'),
+            text=text,
+            text_preview=text_preview(text),
+            author_id=self._lookup(
+                self.user_ids, record.get('author'), 'автор'
+            ),
+            group_id=self._lookup(
+                self.group_ids, record['group'], 'группа'
+            ) if record.get('group') else None,
+            image=record.get('image') or '',
+            pub_date=_parse_date(record.get('pub_date')),
+        )
+
+    def _build_comment(self, record):
+        post_id = _parse_id(record.get('post'), 'пост')
+        if post_id not in self.post_ids:
+            raise RecordError(f'неизвестный пост {record.get("post")!r}')
+        return Comment(
+            id=_parse_id(record.get('id'), 'id'),
+            text=record.get('text') or '',
+            author_id=self._lookup(
+                self.user_ids, record.get('author'), 'автор'
+            ),
+            post_id=post_id,
+            created=_parse_date(record.get('created')),
+        )
+
+    def _build(self, records):
+        """Модели для валидных записей пачки; ошибки копятся в errors."""
+        self._resolve(
+            self.user_ids, User, 'username',
+            {record.get('author') for _, record in records}
+        )
+        if self.model is Post:
+            self._resolve(
+                self.group_ids, Group, 'slug',
+                {record.get('group') for _, record in records}
+            )
+            build = self._build_post
+            exclude = ['author', 'group', 'pub_date']
+        else:
+            post_ids = {
+                str(record.get('post')) for _, record in records
+            }
+            self.post_ids = set(Post.objects.filter(
+                pk__in=[value for value in post_ids if value.isdigit()]
+            ).values_list('pk', flat=True))
+            build = self._build_comment
+            exclude = ['author', 'post', 'created']
+        objects = []
+        for number, record in records:
+            try:
+                obj = build(record)
+                obj.clean_fields(exclude=exclude)
+            except (RecordError, ValidationError) as error:
+                self.errors.append((number, error))
+                continue
+            objects.append((number, obj))
+        if self.model is Post:
+            objects = self._copy_images(objects)
+        return [obj for _, obj in objects]
+
+    def _insert(self, objects):
+        """Вставляет пачку с датами из исходных записей.
+
+        id без явного значения выдает последовательность СУБД, если та
+        возвращает их из bulk_create (PostgreSQL): так живые вставки во
+        время импорта не сталкиваются с импортированными строками.
+        Иначе id назначаются следом за максимальным. После пачки с
+        явными id последовательность сдвигается за них.
+        """
+        model = self.model
+        date_field = model._meta.get_field(
+            'pub_date' if model is Post else 'created'
+        )
+        now = timezone.now()
+        for obj in objects:
+            if getattr(obj, date_field.attname) is None:
+                setattr(obj, date_field.attname, now)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            next_id = (
+                model.objects.aggregate(last=Max('pk'))['last'] or 0
+            ) + 1
+            for obj in objects:
+                if obj.pk is None:
+                    obj.pk, next_id = next_id, next_id + 1
+        explicit_ids = any(obj.pk is not None for obj in objects)
+        with _keeping_dates(date_field):
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        if explicit_ids:
+            reset_sequences(model)
+
+    def _after_posts(self, posts):
+        for author_id, count in Counter(
+            post.author_id for post in posts
+        ).items():
+            counters.shift_user(author_id, 'posts_count', count)
+        feed.fan_out_posts(posts)
+        search.backend.index_posts(posts)
+        return {
+            caching.GLOBAL_SCOPE,
+            *[caching.author_scope(post.author_id) for post in posts],
+            *[
+                caching.group_scope(post.group_id)
+                for post in posts if post.group_id is not None
+            ],
+        }
+
+    def _after_comments(self, comments):
+        for author_id, count in Counter(
+            comment.author_id for comment in comments
+        ).items():
+            counters.shift_user(author_id, 'comments_count', count)
+        posts = Counter(comment.post_id for comment in comments)
+        for post_id, count in posts.items():
+            counters.shift_post(post_id, count)
+        search.backend.index_comments(comments)
+        return {caching.post_scope(post_id) for post_id in posts}
+
+    def import_batch(self, records):
+        """Импортирует пачку записей, возвращает число вставленных."""
+        records = [(number, _normalized(record)) for number, record in records]
+        objects = self._build(records)
+        if not objects:
+            return 0
+        try:
+            with transaction.atomic():
+                self._insert(objects)
+                if self.model is Post:
+                    scopes = self._after_posts(objects)
+                else:
+                    scopes = self._after_comments(objects)
+        except Exception:
+            if self.model is Post:
+                self._release_images(objects)
+            raise
+        caching.bump(*scopes)
+        return len(objects)
+
+    def run(self, records):
+        """Импортирует все записи, после каждой пачки отдает их число."""
+        try:
+            for batch in chunked(records, self.batch_size):
+                yield self.import_batch(batch)
+        finally:
+            self.close()
+
+
+def reset_sequences(model):
+    """Сдвигает последовательность id после вставки с явными ключами."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
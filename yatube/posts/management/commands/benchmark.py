@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import benchmark
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу синтетическими данными и замеряет '
+        'задержки, число запросов и память всех адресов posts. '
+        'С --baseline сравнивает результат с сохраненным отчетом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=benchmark.BENCHMARK_SCALES, default='small'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=benchmark.BENCHMARK_REQUESTS,
+            help='Число запросов к каждому адресу.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='Слать запросы через ASGI-обработчик.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Куда сохранить отчет JSON.')
+        parser.add_argument(
+            '--baseline', help='Базовый отчет JSON для сравнения.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=benchmark.BENCHMARK_TOLERANCE,
+            help='Допустимый рост p95, доля от базового.'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу и не заполнять ее повторно.'
+        )
+
+    def handle(self, *args, **options):
+        scale = benchmark.BENCHMARK_SCALES[options['scale']]
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb']
+        )
+        try:
+            if not Post.objects.exists():
+                self.stderr.write(f'Заполнение базы: {scale}')
+                benchmark.seed(scale, options['seed'])
+            report = benchmark.run(
+                options['requests'], options['cold'], options['asgi']
+            )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        report['scale'] = options['scale']
+        for name, result in report['views'].items():
+            self.stdout.write(
+                f'{name:<18} p50 {result["p50_ms"]:>8} '
+                f'p95 {result["p95_ms"]:>8} p99 {result["p99_ms"]:>8} мс  '
+                f'запросов {result["queries"]:>3}  '
+                f'память {result["allocated_kb"]:>8} КБ'
+            )
+        if options['output']:
+            benchmark.save_report(report, options['output'])
+        if options['baseline']:
+            regressions = benchmark.compare(
+                report,
+                benchmark.load_report(options['baseline']),
+                options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базового отчета:\n'
+                    + '\n'.join(regressions)
+                )
+        self.stdout.write(self.style.SUCCESS('Замер завершен'))
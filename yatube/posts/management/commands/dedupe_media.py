@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import dedupe_images
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, сохраненные до адресации по '
+        'содержимому, под хэш; одинаковые файлы сливаются в один.'
+    )
+
+    def handle(self, *args, **options):
+        moved, removed = dedupe_images()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено постов: {moved}, удалено старых файлов: {removed}'
+        ))
@@ -0,0 +1,59 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+
+from posts.export import (
+    EXPORT_CHUNK_SIZE, EXPORT_FIELDS, EXPORT_FORMATS, EXPORT_MODELS, iter_rows
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки в NDJSON '
+        'или CSV. С --after-id дописывает файл, продолжая выгрузку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=EXPORT_MODELS)
+        parser.add_argument('output', help='Путь к файлу выгрузки.')
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS, default='ndjson'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать файл gzip.'
+        )
+        parser.add_argument(
+            '--after-id', type=int, default=0,
+            help='Выгружать строки с id больше указанного.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        model = EXPORT_MODELS[options['model']]
+        fields = EXPORT_FIELDS[model]
+        export_format = EXPORT_FORMATS[options['format']]
+        after_id = options['after_id']
+        opener = gzip.open if options['gzip'] else open
+        mode = 'at' if after_id else 'wt'
+        count, last_id = 0, after_id
+        try:
+            with opener(options['output'], mode, encoding='utf-8',
+                        newline='') as output:
+                if not after_id:
+                    output.write(export_format.header(fields))
+                rows = iter_rows(
+                    model.objects.all(), fields, after_id,
+                    options['chunk_size']
+                )
+                for row in rows:
+                    output.write(export_format.row(row, fields))
+                    count, last_id = count + 1, row['id']
+        finally:
+            self.stderr.write(
+                f'Выгружено строк: {count}, последний id: {last_id}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка {options["model"]} завершена'
+        ))
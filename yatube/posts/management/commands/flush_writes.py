@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет все операции журнала отложенной записи (WRITE_BEHIND): '
+        'например, оставшиеся после перезапуска без новых записей.'
+    )
+
+    def handle(self, *args, **options):
+        applied = writebehind.drain()
+        self.stdout.write(self.style.SUCCESS(
+            f'Применено операций: {applied}'
+        ))
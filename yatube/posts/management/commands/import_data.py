@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import (
+    IMAGE_WORKERS, IMPORT_BATCH_SIZE, Importer, read_records
+)
+from posts.models import Comment, Post
+
+IMPORT_MODELS = {
+    'posts': Post,
+    'comments': Comment,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово импортирует посты или комментарии из NDJSON или CSV '
+        '(в том числе сжатых gzip), сообщая скорость импорта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=IMPORT_MODELS)
+        parser.add_argument('source', help='Путь к файлу с записями.')
+        parser.add_argument('--format', choices=('ndjson', 'csv'))
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--images-dir',
+            help='Каталог, из которого копируются картинки постов.'
+        )
+        parser.add_argument('--workers', type=int, default=IMAGE_WORKERS)
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            IMPORT_MODELS[options['model']],
+            batch_size=options['batch_size'],
+            images_dir=options['images_dir'],
+            workers=options['workers']
+        )
+        records = read_records(options['source'], options['format'])
+        imported = 0
+        started = time.monotonic()
+        try:
+            for count in importer.run(records):
+                imported += count
+                self.stdout.write(
+                    f'Импортировано: {imported} '
+                    f'({self._rate(imported, started)} строк/с)'
+                )
+        except IntegrityError as error:
+            raise CommandError(
+                f'Пачка после {imported} строк не вставлена: {error}'
+            )
+        for number, error in importer.errors:
+            self.stderr.write(f'Строка {number}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: {imported} строк, '
+            f'пропущено {len(importer.errors)}, '
+            f'{self._rate(imported, started)} строк/с'
+        ))
+
+    def _rate(self, count, started):
+        return int(count / max(time.monotonic() - started, 1e-6))
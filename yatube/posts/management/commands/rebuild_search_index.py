@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по постам и комментариям.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.backend.rebuild(
+                Post.objects.only('pk', 'text').iterator(),
+                Comment.objects.only('pk', 'post_id', 'text').iterator()
+            )
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
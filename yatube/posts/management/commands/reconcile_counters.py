@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_posts, reconcile_users
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и пользователей.'
+
+    def handle(self, *args, **options):
+        users_fixed = reconcile_users()
+        posts_fixed = reconcile_posts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено пользователей: {users_fixed}, '
+            f'постов: {posts_fixed}'
+        ))
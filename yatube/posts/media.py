@@ -0,0 +1,57 @@
+"""Жизненный цикл картинок постов в хранилище с адресацией по содержимому.
+
+Одну картинку могут делить несколько постов. Пост, который удален или
+сменил картинку, отпускает ее; файл и его миниатюры удаляются вместе с
+последней ссылкой.
+"""
+from django.core.files.storage import default_storage
+
+from . import thumbnails
+from .models import Post
+
+
+def release_image(name):
+    """Снимает ссылку поста на картинку; без ссылок чистит миниатюры.
+
+    Картинки, сохраненные до адресации по содержимому, не считаются и
+    остаются на месте, пока их не перенесет команда dedupe_media.
+    """
+    if not default_storage.is_content_addressed(name):
+        return
+    default_storage.delete(name)
+    if default_storage.exists(name):
+        return
+    thumbnails.forget(name)
+
+
+def dedupe_images():
+    """Переносит картинки постов, сохраненные по имени, под хэш.
+
+    Возвращает пару (перенесено постов, удалено старых файлов);
+    одинаковые файлы сливаются в один.
+    """
+    moved = removed = 0
+    names = Post.objects.exclude(image='').values_list(
+        'image', flat=True
+    ).order_by().distinct()
+    for name in list(names):
+        if default_storage.is_content_addressed(name):
+            continue
+        try:
+            source = default_storage.open(name)
+        except FileNotFoundError:
+            continue
+        posts = list(Post.objects.filter(image=name).only('id', 'image'))
+        with source:
+            for post in posts:
+                new_name = default_storage.save(name, source)
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            image=new_name
+        )
+        default_storage.delete(name)
+        moved += len(posts)
+        removed += 1
+        for post in posts:
+            post.image.name = new_name
+            thumbnails.enqueue(post)
+    return moved, removed
@@ -0,0 +1,77 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+from django.utils.module_loading import import_string
+
+from core.middleware import HybridMiddleware
+
+from . import caching
+
+
+class ConditionalPagesMiddleware(HybridMiddleware):
+    """Условный GET для HTML-страниц из CONDITIONAL_VIEWS.
+
+    ETag и Last-Modified вычисляются по версиям областей кэша еще до
+    вызова представления, поэтому неизменившаяся страница получает 304
+    без запросов к базе и рендеринга шаблона. Страница зависит от
+    посетителя, поэтому в ETag входят куки сессии и CSRF, а для
+    вошедшего пользователя — еще и число непрочитанных уведомлений в
+    шапке.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.scopes_funcs = {
+            view_name: import_string(path)
+            for view_name, path in settings.CONDITIONAL_VIEWS.items()
+        }
+
+    def finish(self, request, response):
+        validators = getattr(request, '_conditional_validators', None)
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response.setdefault('ETag', etag)
+            response.setdefault('Last-Modified', http_date(last_modified))
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def _etag(self, request, scopes):
+        visitor = '|'.join(
+            request.COOKIES.get(name, '')
+            for name in (settings.SESSION_COOKIE_NAME,
+                         settings.CSRF_COOKIE_NAME)
+        )
+        raw = f'{caching.etag(request, *scopes)}|{visitor}'.encode()
+        return quote_etag(hashlib.md5(raw).hexdigest())
+
+    def _visitor_scopes(self, request):
+        # Без куки сессии посетитель — гость, и сессию читать незачем.
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return []
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is None:
+            return []
+        return [caching.notifications_scope(user_id)]
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        scopes_func = self.scopes_funcs.get(request.resolver_match.view_name)
+        if scopes_func is None:
+            return None
+        scopes = scopes_func(request, *view_args, **view_kwargs)
+        if not scopes:
+            return None
+        scopes = [*scopes, *self._visitor_scopes(request)]
+        etag = self._etag(request, scopes)
+        last_modified = int(caching.last_modified(*scopes).timestamp())
+        request._conditional_validators = etag, last_modified
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
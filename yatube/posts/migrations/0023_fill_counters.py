@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    users = User.objects.annotate(
+        real_posts=count_of(Post, 'author'),
+        real_comments=count_of(Comment, 'author'),
+        real_followers=count_of(Follow, 'author'),
+        real_following=count_of(Follow, 'user'),
+    )
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(
+                user_id=user.pk,
+                posts_count=user.real_posts,
+                comments_count=user.real_comments,
+                followers_count=user.real_followers,
+                following_count=user.real_following
+            )
+            for user in users.iterator()
+        ],
+        batch_size=1000
+    )
+    posts = Post.objects.annotate(real_comments=count_of(Comment, 'post'))
+    for post in posts.filter(real_comments__gt=0).iterator():
+        Post.objects.filter(pk=post.pk).update(
+            comments_count=post.real_comments
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0022_authorstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
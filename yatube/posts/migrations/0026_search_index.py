@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from posts.stemmer import stem_text
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+        'post_id UNINDEXED, body, '
+        "tokenize = 'unicode61 remove_diacritics 0')"
+    )
+    rows = [
+        (2 * pk, pk, stem_text(text))
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    ]
+    rows += [
+        (2 * pk + 1, post_id, stem_text(text))
+        for pk, post_id, text in Comment.objects.values_list(
+            'pk', 'post_id', 'text'
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, post_id, body) '
+            'VALUES (%s, %s, %s)',
+            rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
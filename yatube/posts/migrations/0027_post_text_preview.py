@@ -0,0 +1,40 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:06
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+TEXT_PREVIEW_LENGTH = 300
+BATCH_SIZE = 1000
+
+
+def fill_text_preview(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'text').iterator():
+        post.text_preview = Truncator(post.text).chars(TEXT_PREVIEW_LENGTH)
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['text_preview'])
+            batch = []
+    Post.objects.bulk_update(batch, ['text_preview'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='text_preview',
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=300,
+                verbose_name='Начало текста'
+            ),
+        ),
+        migrations.RunPython(fill_text_preview, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+FANOUT_FOLLOWERS_LIMIT = 5000
+
+
+def fill_pull_mode(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    popular = Follow.objects.values('author').annotate(
+        followers=Count('id')
+    ).filter(followers__gt=FANOUT_FOLLOWERS_LIMIT).values('author')
+    AuthorStats.objects.filter(user_id__in=popular).update(pull_mode=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pull_mode',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Посты читаются при показе'),
+        ),
+        migrations.RunPython(fill_pull_mode, migrations.RunPython.noop),
+    ]
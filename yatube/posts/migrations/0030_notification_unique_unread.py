@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:12
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    Notification = apps.get_model('posts', 'Notification')
+    merged = {}
+    for row in Notification.objects.filter(read=False).order_by(
+        'updated', 'id'
+    ):
+        key = (row.user_id, row.kind, row.post_id)
+        first = merged.get(key)
+        if first is None:
+            merged[key] = row
+            continue
+        first.count += row.count
+        first.actor_id, first.updated = row.actor_id, row.updated
+        first.save(update_fields=['count', 'actor', 'updated'])
+        row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_authorstats_pull_mode'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('post__isnull', False), ('read', False)), fields=('user', 'kind', 'post'), name='unique_unread_post_notification'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('post__isnull', True), ('read', False)), fields=('user', 'kind'), name='unique_unread_notification'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.text import Truncator
 
 User = get_user_model()
 
@@ -20,8 +21,46 @@ class Group(models.Model):
         return self.title
 
 
+TEXT_PREVIEW_LENGTH: int = 300
+
+# Колонки, которые читает карточка поста в лентах.
+POST_CARD_FIELDS = (
+    'pub_date',
+    'text_preview',
+    'image',
+    'image_variants',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+)
+
+
+def text_preview(text):
+    return Truncator(text).chars(TEXT_PREVIEW_LENGTH)
+
+
+class FeedManager(models.Manager):
+    """Посты для лент: только колонки, которые нужны карточке.
+
+    Полный текст, описание группы и остальные колонки автора (включая
+    хэш пароля) в ленты не загружаются.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'author', 'group'
+        ).only(*POST_CARD_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста')
+    text_preview = models.CharField(
+        'Начало текста',
+        max_length=TEXT_PREVIEW_LENGTH,
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
@@ -45,15 +84,53 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        'Варианты картинки',
+        default=list,
+        blank=True,
+        editable=False
+    )
+
+    objects = models.Manager()
+    feed = FeedManager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
         verbose_name = "post"
         verbose_name_plural = "posts"
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if 'text' not in self.get_deferred_fields() and (
+            update_fields is None or 'text' in update_fields
+        ):
+            self.text_preview = text_preview(self.text)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'text_preview'}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -76,6 +153,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx'
+            ),
+        ]
         verbose_name = "comment"
         verbose_name_plural = "comments"
 
@@ -104,9 +187,167 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = "follow"
         verbose_name_plural = "follows"
 
     def __str__(self):
         desc = f'{self.user} -> {self.author}'
         return desc
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    pull_mode = models.BooleanField(
+        'Посты читаются при показе',
+        default=False,
+        help_text='Посты автора не раскладываются по лентам подписчиков'
+    )
+
+    class Meta:
+        verbose_name = "author stats"
+        verbose_name_plural = "author stats"
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class FeedEntry(models.Model):
+    """Запись персональной ленты подписок (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+        verbose_name = "feed entry"
+        verbose_name_plural = "feed entries"
+
+    def __str__(self):
+        return f'{self.user} <- {self.post_id}'
+
+
+class Notification(models.Model):
+    """Уведомление пользователя.
+
+    Однотипные непрочитанные события сливаются в одну строку: count
+    растет, actor — последний, кто вызвал событие.
+    """
+    COMMENT = 1
+    FOLLOW = 2
+    KINDS = (
+        (COMMENT, 'Новые комментарии'),
+        (FOLLOW, 'Новые подписчики'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    kind = models.PositiveSmallIntegerField('Тип', choices=KINDS)
+    post = models.ForeignKey(
+        Post,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Последний автор события'
+    )
+    count = models.PositiveIntegerField('Число событий', default=1)
+    updated = models.DateTimeField('Дата последнего события')
+    read = models.BooleanField('Прочитано', default=False)
+
+    class Meta:
+        ordering = ['-updated', '-id']
+        # Непрочитанная строка на ключ слияния одна; NULL в post не
+        # совпадают друг с другом, поэтому для событий без поста —
+        # отдельное условие.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'kind', 'post'],
+                condition=models.Q(read=False, post__isnull=False),
+                name='unique_unread_post_notification'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'kind'],
+                condition=models.Q(read=False, post__isnull=True),
+                name='unique_unread_notification'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-updated', '-id'],
+                name='notification_user_updated_idx'
+            ),
+            models.Index(
+                fields=['user', 'read'],
+                name='notification_user_read_idx'
+            ),
+        ]
+        verbose_name = "notification"
+        verbose_name_plural = "notifications"
+
+    def __str__(self):
+        return f'{self.user}: {self.get_kind_display()} ({self.count})'
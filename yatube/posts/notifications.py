@@ -0,0 +1,213 @@
+"""Уведомления авторов о комментариях и подписчиках.
+
+События не пишутся в базу внутри запроса: после коммита они копятся в
+памяти процесса, сливаясь по ключу (получатель, тип, пост), и раз в
+NOTIFICATIONS_FLUSH_INTERVAL секунд фоновый поток записывает их пачкой.
+Сто комментариев к популярному посту между сбросами дают одно обновление
+строки. Пачку, которую не удалось записать из-за временной ошибки базы,
+поток возвращает в очередь. События, не сброшенные до падения процесса,
+теряются.
+"""
+import atexit
+import logging
+import threading
+import time
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching
+from .models import Notification, Post, User
+from .utils import chunked
+from .writebehind import TRANSIENT_ERRORS
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE: int = 500
+UNREAD_CACHE_TIMEOUT = None
+
+# (получатель, тип, пост) -> [число событий, последний автор, время].
+_pending = {}
+_lock = threading.Lock()
+_flusher = None
+
+
+def _unread_key(user_id):
+    return f'notifications_unread:{user_id}'
+
+
+def unread_count(user_id):
+    """Число непрочитанных уведомлений пользователя, хранимое в кэше."""
+    return cache.get_or_set(
+        _unread_key(user_id),
+        lambda: Notification.objects.filter(
+            user_id=user_id, read=False
+        ).count(),
+        caching.timeout(UNREAD_CACHE_TIMEOUT)
+    )
+
+
+def mark_read(user_id):
+    """Отмечает все уведомления пользователя прочитанными."""
+    if unread_count(user_id):
+        Notification.objects.filter(user_id=user_id, read=False).update(
+            read=True
+        )
+        cache.set(
+            _unread_key(user_id), 0, caching.timeout(UNREAD_CACHE_TIMEOUT)
+        )
+        caching.bump_on_commit(caching.notifications_scope(user_id))
+
+
+def notify(user_id, kind, actor_id, post_id=None):
+    """Ставит событие в очередь на запись после коммита транзакции."""
+    if user_id == actor_id:
+        return
+    transaction.on_commit(
+        lambda: _add((user_id, kind, post_id), actor_id, timezone.now())
+    )
+
+
+def _add(key, actor_id, when):
+    with _lock:
+        event = _pending.setdefault(key, [0, actor_id, when])
+        event[0] += 1
+        event[1:] = actor_id, when
+    if _runs_inline():
+        flush()
+    else:
+        _start_flusher()
+
+
+def _runs_inline():
+    """Поток сброса не видит базу SQLite в памяти: она у каждого своя."""
+    return settings.NOTIFICATIONS_FLUSH_INTERVAL == 0 or (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def _alive(batch):
+    """Ключи событий, чьи получатель, автор и пост еще существуют.
+
+    Иначе одна строка со ссылкой на удаленный объект сорвала бы вставку
+    всей пачки.
+    """
+    user_ids = set(User.objects.filter(pk__in={
+        *[user_id for user_id, _, _ in batch],
+        *[actor_id for _, actor_id, _ in batch.values()],
+    }).values_list('pk', flat=True))
+    post_ids = {post_id for _, _, post_id in batch if post_id is not None}
+    if post_ids:
+        post_ids = set(
+            Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+        )
+    return [
+        key for key, (_, actor_id, _) in batch.items()
+        if key[0] in user_ids and actor_id in user_ids
+        and (key[2] is None or key[2] in post_ids)
+    ]
+
+
+def _write(batch):
+    keys = _alive(batch)
+    if not keys:
+        return
+    existing = {
+        (row.user_id, row.kind, row.post_id): row
+        for row in Notification.objects.filter(
+            reduce(or_, (
+                Q(user_id=user_id, kind=kind, post_id=post_id)
+                for user_id, kind, post_id in keys
+            )),
+            read=False
+        )
+    }
+    updated, created = [], []
+    for key in keys:
+        count, actor_id, when = batch[key]
+        row = existing.get(key)
+        if row is None:
+            user_id, kind, post_id = key
+            created.append(Notification(
+                user_id=user_id, kind=kind, post_id=post_id,
+                actor_id=actor_id, count=count, updated=when
+            ))
+        else:
+            row.count += count
+            row.actor_id, row.updated = actor_id, when
+            updated.append(row)
+    with transaction.atomic():
+        Notification.objects.bulk_update(
+            updated, ['count', 'actor', 'updated']
+        )
+        # Ту же строку мог только что вставить другой процесс; тогда
+        # события этого ключа из пачки теряются, но дубля не будет.
+        Notification.objects.bulk_create(created, ignore_conflicts=True)
+    cache.delete_many(list({_unread_key(row.user_id) for row in created}))
+    caching.bump(*{
+        caching.notifications_scope(row.user_id) for row in created
+    })
+
+
+def _requeue(batch):
+    """Возвращает события в очередь к накопленным после выборки.
+
+    Накопленные позже события новее, поэтому автор и время остаются их.
+    """
+    with _lock:
+        for key, (count, actor_id, when) in batch.items():
+            event = _pending.setdefault(key, [0, actor_id, when])
+            event[0] += count
+
+
+def flush():
+    """Записывает накопленные события, возвращает число ключей.
+
+    Пачка с временной ошибкой базы возвращается в очередь до следующего
+    сброса, пачка с другой ошибкой пишется в лог и отбрасывается.
+    """
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    for keys in chunked(batch, FLUSH_BATCH_SIZE):
+        part = {key: batch[key] for key in keys}
+        try:
+            _write(part)
+        except TRANSIENT_ERRORS:
+            logger.warning(
+                'Уведомления отложены до следующего сброса', exc_info=True
+            )
+            _requeue(part)
+        except Exception:
+            logger.exception(
+                'Не удалось записать уведомления, ключей: %s', len(part)
+            )
+    return len(batch)
+
+
+def _run():
+    while True:
+        time.sleep(settings.NOTIFICATIONS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось записать уведомления')
+        finally:
+            connections.close_all()
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(
+            target=_run, name='notifications', daemon=True
+        )
+        _flusher.start()
+    atexit.register(flush)
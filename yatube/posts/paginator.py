@@ -1,10 +1,292 @@
+import base64
+import hashlib
+
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import search
+from .models import Post
 
 LIMIT_POSTS: int = 10
+LIMIT_COMMENTS: int = 20
+COUNT_CACHE_TIMEOUT: int = 60
+
+
+def encode_cursor(obj, date_field='pub_date'):
+    """Упаковывает ключ (дата, id) объекта в непрозрачный токен."""
+    date = getattr(obj, date_field)
+    raw = f'{date.isoformat()}|{obj.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора, для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по (date_field, id), по умолчанию (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET выбирает per_page + 1 строк за курсором,
+    поэтому стоимость страницы не зависит от ее глубины. Страница
+    остается обычным Page: номер и число страниц вычисляются относительно
+    текущего окна, а курсоры соседних страниц лежат в next_cursor и
+    previous_cursor.
+    """
+
+    def __init__(self, object_list, per_page, after=None, before=None,
+                 page_number=None, with_count=False):
+        super().__init__(object_list, per_page)
+        self.after = self.decode(after)
+        self.before = None if self.after else self.decode(before)
+        self.page_number = page_number
+        self.with_count = with_count
+
+    date_field = 'pub_date'
+    decode = staticmethod(decode_cursor)
+
+    @cached_property
+    def count(self):
+        """Приблизительное число объектов из кэша, если оно запрошено."""
+        if not self.with_count:
+            return None
+        query = str(self.object_list.query).encode()
+        key = 'posts_count_' + hashlib.md5(query).hexdigest()
+        return cache.get_or_set(key, self.object_list.count,
+                                COUNT_CACHE_TIMEOUT)
+
+    def encode(self, obj):
+        return encode_cursor(obj, self.date_field)
+
+    def _legacy_offset(self):
+        """Смещение для старых ссылок вида ?page=N."""
+        try:
+            number = int(self.page_number)
+        except (TypeError, ValueError):
+            return 0
+        return max(number - 1, 0) * self.per_page
+
+    def _window(self, objects, limit, offset=0, id_field='id'):
+        """Читает limit строк за курсором в порядке обхода."""
+        date_field = self.date_field
+        ordering = ('-' + date_field, '-' + id_field)
+        if self.after:
+            date, pk = self.after
+            objects = objects.filter(
+                Q(**{date_field + '__lt': date})
+                | Q(**{date_field: date, id_field + '__lt': pk})
+            )
+        elif self.before:
+            date, pk = self.before
+            objects = objects.filter(
+                Q(**{date_field + '__gt': date})
+                | Q(**{date_field: date, id_field + '__gt': pk})
+            )
+            ordering = (date_field, id_field)
+        return list(objects.order_by(*ordering)[offset:offset + limit])
+
+    def _fetch(self, limit, offset):
+        return self._window(self.object_list, limit, offset)
+
+    def cursor_page(self):
+        offset = 0 if self.after or self.before else self._legacy_offset()
+        rows = self._fetch(self.per_page + 1, offset)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.before:
+            if not has_more:
+                self.before = None
+                return self.cursor_page()
+            rows.reverse()
+            has_previous, has_next = True, True
+        else:
+            has_previous = bool(self.after) or offset > 0
+            has_next = has_more
+        number = 2 if has_previous else 1
+        self.num_pages = number + int(has_next)
+        page = self._get_page(rows, number, self)
+        page.next_cursor = self.encode(rows[-1]) if has_next else None
+        page.previous_cursor = (
+            self.encode(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+
+class CommentPaginator(CursorPaginator):
+    """Keyset-пагинатор комментариев по (created, id), новые сверху."""
+    date_field = 'created'
+
+
+class NotificationPaginator(CursorPaginator):
+    """Keyset-пагинатор уведомлений по (updated, id), свежие сверху."""
+    date_field = 'updated'
+
+
+class FeedPaginator(CursorPaginator):
+    """Пагинатор ленты подписок.
+
+    Читает записи FeedEntry по их индексу (user, pub_date, post) и при
+    необходимости подмешивает посты авторов, которые читаются при показе.
+    """
+
+    def __init__(self, entries, per_page, pulled=None, **kwargs):
+        super().__init__(entries, per_page, **kwargs)
+        self.pulled = pulled
+
+    def _fetch(self, limit, offset):
+        if self.pulled is None:
+            entries = self._window(
+                self.object_list, limit, offset, id_field='post_id'
+            )
+            return [entry.post for entry in entries]
+        entries = self._window(
+            self.object_list, offset + limit, id_field='post_id'
+        )
+        posts = [entry.post for entry in entries]
+        posts += self._window(self.pulled, offset + limit)
+        unique = {post.pk: post for post in posts}.values()
+        posts = sorted(
+            unique,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not self.before
+        )
+        return posts[offset:offset + limit]
+
+
+def encode_search_cursor(post):
+    """Упаковывает ключ (rank, id) найденного поста в токен."""
+    raw = f'{post.search_rank!r}|{post.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_search_cursor(token):
+    """Распаковывает токен поискового курсора или возвращает None."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        rank, pk = raw.rsplit('|', 1)
+        return float(rank), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class SearchPaginator(CursorPaginator):
+    """Пагинатор результатов поиска по (rank, id).
+
+    Идентификаторы и ранги выдает поисковый бэкенд, а посты страницы
+    дочитываются одним запросом по первичному ключу.
+    """
+    encode = staticmethod(encode_search_cursor)
+    decode = staticmethod(decode_search_cursor)
+
+    def __init__(self, query, per_page, **kwargs):
+        super().__init__(
+            Post.feed.all(), per_page, **kwargs
+        )
+        self.query = query
+
+    def _fetch(self, limit, offset):
+        hits = search.backend.search(
+            self.query, limit, offset, after=self.after, before=self.before
+        )
+        posts = self.object_list.in_bulk([post_id for post_id, _ in hits])
+        rows = []
+        for post_id, rank in hits:
+            if post_id in posts:
+                posts[post_id].search_rank = rank
+                rows.append(posts[post_id])
+        return rows
+
+
+def page_state(page):
+    """Снимок страницы, пригодный для хранения в кэше."""
+    return (
+        list(page.object_list),
+        page.number,
+        page.paginator.num_pages,
+        page.next_cursor,
+        page.previous_cursor
+    )
+
+
+def restore_page(state):
+    """Восстанавливает страницу из снимка без обращения к базе."""
+    rows, number, num_pages, next_cursor, previous_cursor = state
+    paginator = CursorPaginator(rows, LIMIT_POSTS)
+    paginator.num_pages = num_pages
+    page = paginator._get_page(rows, number, paginator)
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    return page
+
+
+def paginator(request, posts, with_count=False):
+    paginator = CursorPaginator(
+        posts,
+        LIMIT_POSTS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_number=request.GET.get('page'),
+        with_count=with_count
+    )
+    return paginator.cursor_page()
+
+
+def search_paginator(request, query):
+    paginator = SearchPaginator(
+        query,
+        LIMIT_POSTS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_number=request.GET.get('page')
+    )
+    return paginator.cursor_page()
+
+
+def comment_paginator(request, comments):
+    paginator = CommentPaginator(
+        comments,
+        LIMIT_COMMENTS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    return paginator.cursor_page()
+
+
+def feed_paginator(request, entries, pulled=None):
+    paginator = FeedPaginator(
+        entries,
+        LIMIT_POSTS,
+        pulled=pulled,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_number=request.GET.get('page')
+    )
+    return paginator.cursor_page()
 
 
-def paginator(request, posts):
-    paginator = Paginator(posts, LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def notification_paginator(request, notifications):
+    paginator = NotificationPaginator(
+        notifications,
+        LIMIT_POSTS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    return paginator.cursor_page()
@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .stemmer import WORD_RE, stem, stem_text
+from .utils import chunked
+
+MAX_QUERY_TERMS: int = 10
+INDEX_CHUNK_SIZE: int = 1000
+
+
+def build_query(text):
+    """Запрос FTS5 из основ слов: все основы обязательны, по префиксу."""
+    stems = [stem(word) for word in WORD_RE.findall(text)][:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in stems)
+
+
+class SearchBackend:
+    """Интерфейс поискового индекса по постам и комментариям.
+
+    Базовый класс ничего не индексирует и ничего не находит: он
+    используется, когда для СУБД нет реализации.
+    """
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def index_posts(self, posts):
+        for post in posts:
+            self.index_post(post)
+
+    def index_comments(self, comments):
+        for comment in comments:
+            self.index_comment(comment)
+
+    def rebuild(self, posts, comments):
+        pass
+
+    def search(self, query, limit, offset=0, after=None, before=None):
+        """Пары (post_id, rank) по возрастанию rank, затем post_id.
+
+        after и before — ключи (rank, post_id), за которыми нужно
+        продолжить выдачу; для before порядок обратный.
+        """
+        return []
+
+
+class SqliteFtsBackend(SearchBackend):
+    """Инвертированный индекс на виртуальной таблице SQLite FTS5.
+
+    В индекс пишутся основы слов, поэтому запрос находит все формы слова.
+    Посты и комментарии хранятся в одной таблице: rowid поста — 2 * id,
+    комментария — 2 * id + 1, а post_id связывает комментарий с постом.
+    """
+    table = 'posts_search'
+
+    def _upsert(self, rows):
+        """Заменяет строки индекса; rows — тройки (rowid, post_id, text)."""
+        rows = [
+            (rowid, post_id, stem_text(text)) for rowid, post_id, text in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(rowid,) for rowid, _, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, post_id, body) '
+                'VALUES (%s, %s, %s)',
+                rows
+            )
+
+    def _delete(self, where, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE {where}', params)
+
+    def index_post(self, post):
+        self.index_posts([post])
+
+    def index_posts(self, posts):
+        self._upsert([(2 * post.pk, post.pk, post.text) for post in posts])
+
+    def remove_post(self, post_id):
+        self._delete('post_id = %s', [post_id])
+
+    def index_comment(self, comment):
+        self.index_comments([comment])
+
+    def index_comments(self, comments):
+        self._upsert([
+            (2 * comment.pk + 1, comment.post_id, comment.text)
+            for comment in comments
+        ])
+
+    def remove_comment(self, comment_id):
+        self._delete('rowid = %s', [2 * comment_id + 1])
+
+    def rebuild(self, posts, comments):
+        self._delete('1 = 1', [])
+        for chunk in chunked(posts, INDEX_CHUNK_SIZE):
+            self.index_posts(chunk)
+        for chunk in chunked(comments, INDEX_CHUNK_SIZE):
+            self.index_comments(chunk)
+
+    def search(self, query, limit, offset=0, after=None, before=None):
+        match = build_query(query)
+        if not match:
+            return []
+        having, params, ordering = '', [match], 'rank, post_id'
+        if after or before:
+            rank, post_id = after or before
+            sign = '>' if after else '<'
+            having = (
+                f'HAVING rank {sign} %s '
+                f'OR (rank = %s AND post_id {sign} %s)'
+            )
+            params += [rank, rank, post_id]
+            if before:
+                ordering = 'rank DESC, post_id DESC'
+        # bm25() нельзя вызывать внутри агрегата, а LIMIT -1 не дает
+        # SQLite встроить подзапрос во внешний GROUP BY.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT post_id, MIN(score) AS rank FROM ('
+                f'SELECT post_id, bm25({self.table}) AS score '
+                f'FROM {self.table} WHERE {self.table} MATCH %s LIMIT -1'
+                f') GROUP BY post_id {having} '
+                f'ORDER BY {ordering} LIMIT %s OFFSET %s',
+                params + [limit, offset]
+            )
+            return cursor.fetchall()
+
+
+backend = SimpleLazyObject(lambda: import_string(settings.SEARCH_BACKEND)())
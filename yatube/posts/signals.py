@@ -0,0 +1,245 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    caching, counters, events, feed, media, notifications, search,
+    thumbnails, variants
+)
+from .models import (
+    AuthorStats, Comment, Follow, Group, Notification, Post, User
+)
+
+USER_CARD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'image', 'image_variants'
+    ).first() if instance.pk else None
+    (
+        instance._previous_group_id,
+        instance._previous_image,
+        stale_variants
+    ) = previous or (None, None, [])
+    # Новая загрузка еще не сохранена в хранилище: та же картинка
+    # повторно получит в нем лишнюю ссылку.
+    instance._image_uploaded = bool(
+        instance.image and not instance.image._committed
+    )
+    if instance.image.name != instance._previous_image:
+        instance.image_variants = []
+        if stale_variants:
+            transaction.on_commit(
+                lambda: variants.delete_variants(stale_variants)
+            )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_feeds(sender, instance, **kwargs):
+    scopes = {
+        caching.GLOBAL_SCOPE,
+        caching.author_scope(instance.author_id),
+        caching.post_scope(instance.pk),
+    }
+    for group_id in (instance.group_id,
+                     getattr(instance, '_previous_group_id', None)):
+        if group_id is not None:
+            scopes.add(caching.group_scope(group_id))
+    caching.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, **kwargs):
+    previous_image = getattr(instance, '_previous_image', None)
+    if instance.image and instance.image.name != previous_image:
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_save, sender=Post)
+def release_previous_image(sender, instance, **kwargs):
+    previous_image = getattr(instance, '_previous_image', None)
+    if previous_image and (
+        previous_image != instance.image.name
+        or getattr(instance, '_image_uploaded', False)
+    ):
+        transaction.on_commit(lambda: media.release_image(previous_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: media.release_image(name))
+
+
+@receiver(post_delete, sender=Post)
+def delete_image_variants(sender, instance, **kwargs):
+    stale_variants = instance.image_variants
+    if stale_variants:
+        transaction.on_commit(
+            lambda: variants.delete_variants(stale_variants)
+        )
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.backend.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.backend.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.backend.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.backend.remove_comment(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_feeds(sender, instance, **kwargs):
+    slug = instance.slug
+    transaction.on_commit(lambda: caching.forget_id(Group, slug))
+    caching.bump_on_commit(
+        caching.GLOBAL_SCOPE,
+        caching.GROUPS_SCOPE,
+        caching.group_scope(instance.pk),
+        caching.group_info_scope(instance.pk)
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_user_cards(sender, instance, created, update_fields, **kwargs):
+    username = instance.username
+    transaction.on_commit(lambda: caching.forget_id(User, username))
+    if created:
+        return
+    if update_fields is not None and not USER_CARD_FIELDS & set(update_fields):
+        return
+    group_ids = Post.objects.filter(
+        author=instance, group__isnull=False
+    ).values_list('group_id', flat=True).distinct()
+    caching.bump_on_commit(
+        caching.GLOBAL_SCOPE,
+        caching.author_scope(instance.pk),
+        caching.user_scope(instance.pk),
+        *[caching.group_scope(group_id) for group_id in group_ids]
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_post(sender, instance, **kwargs):
+    caching.bump_on_commit(caching.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def announce_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: events.publish_post(instance))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follow_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_follow_feed(sender, instance, **kwargs):
+    feed.drop_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_author(sender, instance, **kwargs):
+    caching.bump_on_commit(
+        caching.author_scope(instance.author_id),
+        caching.following_scope(instance.user_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def resubscribe_follow_stream(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: events.publish_follows_changed(user_id))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+def _delta(signal, created=False):
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def count_posts(sender, instance, signal, created=False, **kwargs):
+    delta = _delta(signal, created)
+    if delta:
+        counters.shift_user(instance.author_id, 'posts_count', delta)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comments(sender, instance, signal, created=False, **kwargs):
+    delta = _delta(signal, created)
+    if delta:
+        counters.shift_post(instance.post_id, delta)
+        counters.shift_user(instance.author_id, 'comments_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def count_follows(sender, instance, signal, created=False, **kwargs):
+    delta = _delta(signal, created)
+    if delta:
+        counters.shift_user(instance.author_id, 'followers_count', delta)
+        counters.shift_user(instance.user_id, 'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def switch_pull_mode(sender, instance, **kwargs):
+    # Подключен после count_follows и сверяется с уже сдвинутым счетчиком.
+    feed.update_pull_mode(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def notify_post_author(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify(
+            instance.post.author_id,
+            Notification.COMMENT,
+            instance.author_id,
+            instance.post_id
+        )
+
+
+@receiver(post_save, sender=Follow)
+def notify_followed_author(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify(
+            instance.author_id, Notification.FOLLOW, instance.user_id
+        )
@@ -0,0 +1,151 @@
+"""Стеммер русского языка по алгоритму Snowball.
+
+Слова на латинице и цифры возвращаются без изменений.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им',
+    'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя',
+    'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+        'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+        'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+        'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('^[а-я]+$')
+
+
+def _regions(word):
+    """Начала областей RV и R2 в слове."""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    r1 = _after_vowel_consonant(word, 0)
+    r2 = _after_vowel_consonant(word, r1)
+    return rv, r2
+
+
+def _after_vowel_consonant(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(rv_part, endings):
+    for ending in sorted(endings, key=len, reverse=True):
+        if rv_part.endswith(ending):
+            return rv_part[:-len(ending)]
+    return None
+
+
+def _strip_grouped(rv_part, groups):
+    """Снимает окончание; окончания первой группы — только после а или я."""
+    first, second = groups
+    for ending in sorted(first + second, key=len, reverse=True):
+        if not rv_part.endswith(ending):
+            continue
+        stem = rv_part[:-len(ending)]
+        if ending in second:
+            return stem
+        if stem.endswith(('а', 'я')):
+            return stem
+    return None
+
+
+def _strip_adjectival(rv_part):
+    stem = _strip(rv_part, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _strip_grouped(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def _step1(rv_part):
+    """Деепричастие либо возвратная частица и одно из окончаний."""
+    stemmed = _strip_grouped(rv_part, PERFECTIVE_GERUND)
+    if stemmed is not None:
+        return stemmed
+    reflexive = _strip(rv_part, REFLEXIVE)
+    if reflexive is not None:
+        rv_part = reflexive
+    for step in (
+        _strip_adjectival,
+        lambda part: _strip_grouped(part, VERB),
+        lambda part: _strip(part, NOUN),
+    ):
+        stemmed = step(rv_part)
+        if stemmed is not None:
+            return stemmed
+    return rv_part
+
+
+def _step2_3(rv_part, r2_start):
+    """Конечное и, затем словообразовательный суффикс в области R2."""
+    if rv_part.endswith('и'):
+        rv_part = rv_part[:-1]
+    derivational = _strip(rv_part[r2_start:], DERIVATIONAL)
+    if derivational is not None:
+        rv_part = rv_part[:r2_start] + derivational
+    return rv_part
+
+
+def _step4(rv_part):
+    """Двойное н, превосходная степень или мягкий знак."""
+    if rv_part.endswith('нн'):
+        return rv_part[:-1]
+    superlative = _strip(rv_part, SUPERLATIVE)
+    if superlative is not None:
+        if superlative.endswith('нн'):
+            return superlative[:-1]
+        return superlative
+    if rv_part.endswith('ь'):
+        return rv_part[:-1]
+    return rv_part
+
+
+def stem(word):
+    """Основа русского слова."""
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv, r2 = _regions(word)
+    prefix, rv_part = word[:rv], word[rv:]
+    rv_part = _step1(rv_part)
+    rv_part = _step2_3(rv_part, max(r2 - rv, 0))
+    return prefix + _step4(rv_part)
+
+
+def stem_text(text):
+    """Основы всех слов текста через пробел."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
@@ -0,0 +1,66 @@
+from django import template
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.utils.safestring import mark_safe
+
+from posts import caching, thumbnails
+
+PLACEHOLDER_IMAGE = 'img/placeholder.svg'
+PICTURE_SIZES = '(min-width: 1200px) 960px, 100vw'
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, links=False):
+    """Карточка поста из кэша, рендерится заново только после изменений."""
+    key = caching.card_key(post, links)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(
+            'posts/includes/post.html',
+            {'post': post, 'links': links}
+        )
+        cache.set(key, html, caching.timeout())
+    return mark_safe(html)
+
+
+@register.simple_tag
+def post_image_url(post, geometry):
+    """Адрес миниатюры картинки поста.
+
+    Пока миниатюра не готова, возвращает заглушку и ставит генерацию
+    в очередь, чтобы не ресайзить картинку внутри запроса.
+    """
+    thumbnail = thumbnails.ready_thumbnail(post, geometry)
+    if thumbnail is None:
+        thumbnails.enqueue(post)
+        return static(PLACEHOLDER_IMAGE)
+    return thumbnail.url
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, geometry='960x339'):
+    """Картинка поста с адаптивными вариантами в современных форматах.
+
+    Браузер выбирает из srcset вариант подходящей ширины и формата,
+    а для старых браузеров остается миниатюра из src.
+    """
+    srcsets = {}
+    for variant in post.image_variants:
+        srcsets.setdefault(variant['format'], []).append(
+            f"{default_storage.url(variant['name'])} {variant['width']}w"
+        )
+    width, height = map(int, geometry.split('x'))
+    return {
+        'src': post_image_url(post, geometry),
+        'sources': [
+            {'type': f'image/{image_format}', 'srcset': ', '.join(srcset)}
+            for image_format, srcset in srcsets.items()
+        ],
+        'sizes': PICTURE_SIZES,
+        'width': width,
+        'height': height,
+    }
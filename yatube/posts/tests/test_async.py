@@ -0,0 +1,98 @@
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from django.urls import resolve, reverse
+from core import metrics
+from core.testing import strict_query_budgets
+from posts.models import Post, Group, Follow
+
+User = get_user_model()
+
+
+@strict_query_budgets
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Group', slug='async')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Асинхронный пост'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': cls.author.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def setUp(self):
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+        metrics.reset()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_feed_views_are_coroutines_only_under_asgi(self):
+        """Под ASGI ленты асинхронные, под WSGI — нет; бюджет тот же."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                view = resolve(url).func
+                async_view = resolve(url, settings.ASGI_URLCONF).func
+                self.assertFalse(asyncio.iscoroutinefunction(view))
+                self.assertTrue(asyncio.iscoroutinefunction(async_view))
+                self.assertEqual(async_view.query_budget, view.query_budget)
+
+    async def test_pages_render_under_asgi(self):
+        """Под ASGI ленты и страница поста показывают пост в бюджете."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, self.post.text)
+                self.assertEqual(response.query_problems, [])
+
+    async def test_conditional_get_under_asgi(self):
+        """Под ASGI неизменившаяся страница отдает 304."""
+        url = self.urls['posts:post_detail']
+        # Первый ответ ставит куку CSRF, а она входит в ETag.
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # AsyncClient в Django 3.2 передает лишние аргументы как заголовки
+        # с теми же именами, а не как ключи META.
+        response = await self.async_client.get(
+            url, **{'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_metrics_follow_async_requests(self):
+        """Под ASGI время запроса и SQL попадают в метрики представления."""
+        await self.async_client.get(self.urls['posts:index'])
+        output = metrics.render()
+        for name in (metrics.REQUEST_SECONDS, metrics.SQL_SECONDS):
+            with self.subTest(name=name):
+                self.assertIn(f'{name}_count{{view="posts:index"}} 1', output)
+        self.assertNotIn(
+            f'{metrics.SQL_SECONDS}_sum{{view="posts:index"}} 0.0\n', output
+        )
+
+    async def test_login_required_under_asgi(self):
+        """Гостя лента подписок под ASGI отправляет на вход."""
+        response = await AsyncClient().get(self.urls['posts:follow_index'])
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from posts import benchmark
+from posts.models import Follow, Post
+from posts.urls import urlpatterns
+
+TINY_SCALE = benchmark.Scale(
+    users=30, groups=3, posts=120, comments=200, follows_per_user=5
+)
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(TINY_SCALE)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_seed_builds_consistent_dataset(self):
+        """Синтетические данные согласованы со счетчиками и лентами."""
+        self.assertEqual(Post.objects.count(), TINY_SCALE.posts)
+        follow = Follow.objects.select_related('author__stats').first()
+        self.assertEqual(
+            follow.author.stats.followers_count,
+            Follow.objects.filter(author=follow.author).count()
+        )
+        self.assertEqual(
+            follow.user.feed_entries.count(),
+            Post.objects.filter(
+                author__following__user=follow.user
+            ).count()
+        )
+
+    def test_run_covers_every_url(self):
+        """Замер проходит по всем адресам posts без ошибок."""
+        report = benchmark.run(repeat=2)
+        self.assertEqual(
+            set(report['views']),
+            {pattern.name for pattern in urlpatterns}
+        )
+        for name, result in report['views'].items():
+            with self.subTest(name=name):
+                self.assertLess(max(result['statuses']), 400)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare_reports_regressions(self):
+        """Рост p95 сверх допуска и рост числа запросов — регрессии."""
+        baseline = {'views': {
+            'index': {'p95_ms': 10, 'queries': 3},
+            'search': {'p95_ms': 10, 'queries': 4},
+        }}
+        report = {'views': {
+            'index': {'p95_ms': 11, 'queries': 3},
+            'search': {'p95_ms': 15, 'queries': 5},
+            'comments': {'p95_ms': 20, 'queries': 2},
+        }}
+        self.assertEqual(
+            benchmark.compare(report, baseline, tolerance=0.2),
+            ['search: p95 10 -> 15 мс', 'search: запросов 4 -> 5']
+        )
+
+    def test_percentile_uses_nearest_rank(self):
+        """Перцентили считаются методом ближайшего ранга."""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
-from posts.models import Post
+from posts.models import Post, Group
 from django.core.cache import cache
+from posts import caching
+from posts.caching import card_key
 
 User = get_user_model()
 
@@ -12,23 +14,121 @@ class CacheTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(slug='test_slug')
         cls.post = Post.objects.create(
             text='TestText',
-            author=cls.user
+            author=cls.user,
+            group=cls.group
         )
         cls.client = Client()
 
+    def tearDown(self):
+        cache.clear()
+
     def test_index_page_saved_in_cache(self):
         '''Главная страница сохраняется в кэше'''
-        response_pre = self.client.get(reverse('posts:index'))
-        posts_count = Post.objects.count()
-        self.post.delete()
-        self.assertEqual(Post.objects.count(), posts_count - 1)
-        response_post = self.client.get(reverse('posts:index'))
-        self.assertEqual(response_pre.content, response_post.content)
-        cache.clear()
-        response_cleared = self.client.get(reverse('posts:index'))
-        self.assertNotEqual(
-            response_pre.content,
-            response_cleared.content
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0], self.post)
+
+    def test_feeds_invalidated_on_post_change(self):
+        '''Изменение поста сразу сбрасывает кэш его лент'''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
         )
+        for url in urls:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_post = Post.objects.create(
+                text='NewText',
+                author=self.user,
+                group=self.group
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['page_obj'][0], new_post)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['page_obj'][0], self.post)
+
+    def test_feeds_invalidated_after_commit(self):
+        '''Кэш лент сбрасывается только после коммита изменения'''
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(text='NewText', author=self.user)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=20)
+    def test_process_cache_keeps_entries_briefly(self):
+        '''Без общего кэша записи живут не дольше LOCAL_CACHE_TIMEOUT'''
+        self.assertEqual(caching.timeout(), 20)
+        self.assertEqual(caching.timeout(None), 20)
+        self.assertEqual(caching.timeout(5), 5)
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }}):
+            self.assertEqual(caching.timeout(), caching.FEED_CACHE_TIMEOUT)
+            self.assertIsNone(caching.timeout(None))
+
+    def test_group_change_invalidates_old_group(self):
+        '''Перенос поста в другую группу сбрасывает кэш старой группы'''
+        other_group = Group.objects.create(slug='other_slug')
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        self.post.group = other_group
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.post.group = self.group
+        self.post.save()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='TestUser',
+            first_name='Old'
+        )
+        cls.group = Group.objects.create(title='Old group', slug='test_slug')
+        cls.post = Post.objects.create(
+            text='TestText',
+            author=cls.user,
+            group=cls.group
+        )
+        cls.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_post_card_saved_in_cache(self):
+        '''Карточка поста сохраняется в кэше и не рендерится повторно'''
+        self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(card_key(self.post, True)))
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateNotUsed(response, 'posts/includes/post.html')
+
+    def test_post_card_invalidated_on_author_and_post_change(self):
+        '''Карточка обновляется при изменении поста и имени автора'''
+        self.client.get(reverse('posts:index'))
+        self.user.first_name = 'New'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Автор: New')
+        self.post.text = 'EditedText'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'EditedText')
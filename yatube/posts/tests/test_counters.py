@@ -0,0 +1,56 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from posts.models import Post, Comment, Follow, AuthorStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.follower = User.objects.create_user(username='Follower')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_posts_comments_and_follows(self):
+        """Счетчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(author=self.author, text='Text')
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='Comment'
+        )
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        self.assertEqual(self.stats(self.follower).comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(self.stats(self.follower).comments_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения счетчиков."""
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'Bulk {i}') for i in range(3)]
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.follower, text='Bulk')]
+        )
+        AuthorStats.objects.filter(user=self.follower).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertEqual(self.stats(self.follower).comments_count, 1)
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from core.pubsub import LocalBroker
+from posts import events
+from posts.models import Post, Group, Follow
+
+User = get_user_model()
+
+
+class EventStream:
+    """Запрос к EventStreamRouter с очередями вместо сервера ASGI."""
+
+    def __init__(self, path, cookies=None):
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        headers = []
+        if cookies:
+            headers.append((b'cookie', cookies.encode()))
+        self.scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'headers': headers,
+        }
+
+    async def start(self):
+        async def django_application(scope, receive, send):
+            raise AssertionError(f'{scope["path"]} ушел в Django')
+
+        router = events.EventStreamRouter(django_application)
+        await self.incoming.put({'type': 'http.request', 'body': b''})
+        self.task = asyncio.ensure_future(
+            router(self.scope, self.incoming.get, self.sent.put)
+        )
+        return await self.receive()
+
+    async def receive(self):
+        return await asyncio.wait_for(self.sent.get(), 1)
+
+    async def close(self):
+        await self.incoming.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 1)
+
+
+class BrokerTests(TestCase):
+    async def test_publish_from_other_thread(self):
+        """Событие из другого потока приходит подписчику канала."""
+        broker = LocalBroker()
+        async with broker.subscribe(['a', 'b']) as subscription:
+            thread = threading.Thread(
+                target=broker.publish, args=('b', {'id': 1})
+            )
+            thread.start()
+            thread.join()
+            broker.publish('c', {'id': 2})
+            message = await asyncio.wait_for(subscription.get(), 1)
+        self.assertEqual(message, {'id': 1})
+        self.assertEqual(broker._subscriptions, {})
+
+
+class EventsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='Group', slug='events')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_new_post_published_after_commit(self):
+        """Новый пост после коммита уходит в каналы своих лент."""
+        with mock.patch.object(events, 'broker') as broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'
+                )
+            post.save()
+        self.assertCountEqual(
+            [call.args for call in broker.publish.call_args_list],
+            [
+                (events.GLOBAL_CHANNEL, {'id': post.pk}),
+                (events.author_channel(self.author.pk), {'id': post.pk}),
+                (events.group_channel(self.group.pk), {'id': post.pk}),
+            ]
+        )
+
+    async def test_stream_delivers_new_posts(self):
+        """Поток ленты отдает новые посты ее каналов, пока клиент открыт."""
+        cases = (
+            (reverse('posts:events'), events.GLOBAL_CHANNEL),
+            (
+                reverse('posts:group_events', args=[self.group.slug]),
+                events.group_channel(self.group.pk)
+            ),
+            (
+                reverse('posts:profile_events', args=[self.author.username]),
+                events.author_channel(self.author.pk)
+            ),
+        )
+        for path, channel in cases:
+            with self.subTest(path=path):
+                stream = EventStream(path)
+                start = await stream.start()
+                self.assertEqual(start['status'], 200)
+                self.assertIn(
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    start['headers']
+                )
+                await stream.receive()
+                events.broker.publish(channel, {'id': 7})
+                message = await stream.receive()
+                self.assertEqual(
+                    message['body'],
+                    b'event: post\nid: 7\ndata: {"id": 7}\n\n'
+                )
+                await stream.close()
+
+    async def test_follow_stream_listens_to_followed_authors(self):
+        """Лента подписок слушает авторов, на которых подписан читатель."""
+        client = Client()
+        await sync_to_async(client.force_login)(self.user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        stream = EventStream(
+            reverse('posts:follow_events'),
+            f'{settings.SESSION_COOKIE_NAME}={cookie.value}'
+        )
+        self.assertEqual((await stream.start())['status'], 200)
+        await stream.receive()
+        events.broker.publish(events.author_channel(self.user.pk), {'id': 1})
+        events.broker.publish(
+            events.author_channel(self.author.pk), {'id': 2}
+        )
+        message = await stream.receive()
+        self.assertIn(b'id: 2\n', message['body'])
+        await stream.close()
+
+    async def test_follow_stream_resubscribes_on_follow(self):
+        """После новой подписки поток подписок закрывается для повтора."""
+        client = Client()
+        await sync_to_async(client.force_login)(self.user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        stream = EventStream(
+            reverse('posts:follow_events'),
+            f'{settings.SESSION_COOKIE_NAME}={cookie.value}'
+        )
+        await stream.start()
+        await stream.receive()
+        other = await sync_to_async(User.objects.create_user)('Other')
+
+        def follow():
+            with self.captureOnCommitCallbacks(execute=True):
+                Follow.objects.create(user=self.user, author=other)
+
+        await sync_to_async(follow)()
+        message = await stream.receive()
+        self.assertEqual(message['type'], 'http.response.body')
+        self.assertFalse(message.get('more_body', False))
+        await asyncio.wait_for(stream.task, 1)
+
+    async def test_stream_errors(self):
+        """Гостю лента подписок недоступна, у несуществующей ленты 404."""
+        for path, status in (
+            (reverse('posts:follow_events'), 403),
+            (reverse('posts:group_events', args=['missing']), 404),
+            (reverse('posts:profile_events', args=['missing']), 404),
+        ):
+            with self.subTest(path=path):
+                stream = EventStream(path)
+                self.assertEqual((await stream.start())['status'], status)
+
+    def test_wsgi_fallback_stops_reconnects(self):
+        """Под WSGI адрес потока отвечает 204 и виден на странице ленты."""
+        url = reverse('posts:events')
+        self.assertEqual(self.client.get(url).status_code, 204)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), f'data-events="{url}"'
+        )
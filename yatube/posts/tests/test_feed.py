@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.cache import cache
+from posts.models import AuthorStats, Post, Follow, FeedEntry
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.old_post = Post.objects.create(author=cls.author, text='Old')
+
+    def setUp(self):
+        self.authorized_follower = Client()
+        self.authorized_follower.force_login(self.follower)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_follow_backfills_and_unfollow_cleans_feed(self):
+        """Подписка заполняет ленту старыми постами, отписка ее чистит."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.old_post
+        ).exists())
+        Follow.objects.filter(user=self.follower, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.follower).exists())
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='New')
+        entry = FeedEntry.objects.get(user=self.follower, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(entry.author, self.author)
+
+    def test_follow_index_reads_feed_in_two_queries(self):
+        """Лента подписок читается без N+1 запросов к авторам и группам."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=f'Bulk {i}') for i in range(5)]
+        )
+        for post in Post.objects.filter(text__startswith='Bulk'):
+            FeedEntry.objects.create(
+                user=self.follower,
+                post=post,
+                author=self.author,
+                pub_date=post.pub_date
+            )
+        self.authorized_follower.get(reverse('posts:follow_index'))
+        with self.assertNumQueries(4):
+            response = self.authorized_follower.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(len(response.context['page_obj']), 6)
+
+    @mock.patch('posts.feed.FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_popular_author_posts_are_pulled_on_read(self):
+        """Посты автора с большим числом подписчиков
+        не раскладываются по лентам, а подмешиваются при показе."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Pulled')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post, self.old_post]
+        )
+
+    @mock.patch('posts.feed.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_author_leaving_pull_mode_is_backfilled(self):
+        """Автор, у которого стало мало подписчиков, снова раскладывается
+        по лентам, и его посты попадают к оставшимся подписчикам."""
+        other = User.objects.create_user(username='Other')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.follower, author=self.author)
+            Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Pulled')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        with self.captureOnCommitCallbacks() as callbacks:
+            Follow.objects.filter(user=other).delete()
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
+
+    @mock.patch('posts.feed.FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_pull_mode_survives_cache_loss(self):
+        """Режим автора хранится в базе и не теряется с кэшем."""
+        other = User.objects.create_user(username='Other')
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.follower, author=self.author)
+            Follow.objects.create(user=other, author=self.author)
+        self.assertTrue(
+            AuthorStats.objects.get(user=self.author).pull_mode
+        )
+        post = Post.objects.create(author=self.author, text='Pulled')
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=other).delete()
+        self.assertFalse(
+            AuthorStats.objects.get(user=self.author).pull_mode
+        )
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=post
+        ).exists())
@@ -1,9 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
+from core.testing import strict_query_budgets
 from posts.models import Post, Group, Comment
 from django.urls import reverse
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+import hashlib
 import shutil
 import tempfile
 
@@ -13,6 +16,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@strict_query_budgets
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -44,6 +48,9 @@ class PostCreateFormTests(TestCase):
             content=self.small_gif,
             content_type='image/gif'
         )
+        self.image_name = default_storage.content_name(
+            'posts/small.gif', hashlib.sha256(self.small_gif).hexdigest()
+        )
 
     def tearDown(self):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
@@ -66,7 +73,7 @@ class PostCreateFormTests(TestCase):
         self.assertTrue(
             Post.objects.filter(
                 text=self.post.text,
-                image='posts/small.gif'
+                image=self.image_name
             ).exists()
         )
         self.assertRedirects(response, reverse(
@@ -95,7 +102,7 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 id=self.post.id,
                 text='TestEditedText',
-                image='posts/small.gif'
+                image=self.image_name
             ).exists()
         )
         self.assertRedirects(response, reverse(
@@ -132,6 +139,7 @@ class PostCreateFormTests(TestCase):
         self.assertRedirects(response, url_edit_redirect)
 
 
+@strict_query_budgets
 class PostCommentFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
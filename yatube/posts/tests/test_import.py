@@ -0,0 +1,179 @@
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.models import Blob
+from posts import search
+from posts.importer import Importer
+from posts.models import Post, Group, Comment, Follow, FeedEntry
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Legacy')
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.group = Group.objects.create(title='Group', slug='legacy')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        cache.clear()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as source:
+            source.write(content)
+        return path
+
+    def import_data(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'import_data', *args, stdout=stdout, stderr=stderr, **options
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_posts_import_keeps_derived_data_in_sync(self):
+        """Импорт постов обновляет счетчики, ленты и поисковый индекс."""
+        records = [
+            {'author': 'Legacy', 'group': 'legacy', 'text': 'Старый блог',
+             'pub_date': '2015-01-02T03:04:05+00:00'},
+            {'author': 'Legacy', 'text': 'Второй пост'},
+            {'author': 'Nobody', 'text': 'Без автора'},
+            {'author': 'Legacy', 'text': ''},
+        ]
+        path = self.write(
+            'posts.ndjson',
+            '\n'.join(json.dumps(record) for record in records)
+        )
+        stdout, stderr = self.import_data('posts', path, batch_size=2)
+        self.assertIn('Импорт завершен: 2 строк', stdout)
+        self.assertIn('Строка 3', stderr)
+        self.assertIn('Строка 4', stderr)
+        post = Post.objects.get(text='Старый блог')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.text_preview, 'Старый блог')
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(), 2
+        )
+        found = [post_id for post_id, _ in search.backend.search('блога', 10)]
+        self.assertEqual(found, [post.pk])
+
+    def test_dates_are_written_by_insert(self):
+        """Даты из записей пишутся вставкой, без повторного UPDATE."""
+        path = self.write('posts.ndjson', json.dumps(
+            {'author': 'Legacy', 'text': 'Дата',
+             'pub_date': '2015-01-02T03:04:05+00:00'}
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            self.import_data('posts', path)
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post" SET "pub_date"')
+        ])
+        self.assertEqual(Post.objects.get(text='Дата').pub_date.year, 2015)
+        post = Post.objects.create(author=self.author, text='Сейчас')
+        self.assertEqual(post.pub_date.year, timezone.now().year)
+
+    def test_comments_import_from_csv(self):
+        """Комментарии импортируются из CSV к существующим постам."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        content = StringIO()
+        writer = csv.writer(content)
+        writer.writerow(['post', 'author', 'text', 'created'])
+        writer.writerow([post.pk, 'Follower', 'Первый', ''])
+        writer.writerow([post.pk + 1, 'Follower', 'К чужому посту', ''])
+        path = self.write('comments.csv', content.getvalue())
+        stdout, stderr = self.import_data('comments', path)
+        self.assertIn('Строка 3', stderr)
+        comment = Comment.objects.get(post=post)
+        self.assertEqual(comment.author, self.follower)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_failed_batch_releases_images(self):
+        """Картинки пачки, которая не вставилась, удаляются из хранилища."""
+        content = b'GIF89a-orphan'
+        with open(os.path.join(self.directory, 'legacy.gif'), 'wb') as image:
+            image.write(content)
+        path = self.write('posts.ndjson', json.dumps(
+            {'author': 'Legacy', 'text': 'Дубль', 'image': 'legacy.gif'}
+        ))
+        with mock.patch.object(
+            Importer, '_insert', side_effect=IntegrityError('duplicate')
+        ), self.assertRaises(CommandError):
+            self.import_data('posts', path, images_dir=self.directory)
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(default_storage.content_name(
+            'posts/legacy.gif', hashlib.sha256(content).hexdigest()
+        )))
+
+    def test_images_are_copied_to_storage(self):
+        """Картинки постов копируются из каталога импорта в хранилище."""
+        with open(os.path.join(self.directory, 'legacy.gif'), 'wb') as image:
+            image.write(b'GIF89a')
+        path = self.write('posts.ndjson', '\n'.join([
+            json.dumps({'author': 'Legacy', 'text': 'С картинкой',
+                        'image': 'legacy.gif'}),
+            json.dumps({'author': 'Legacy', 'text': 'Без файла',
+                        'image': 'missing.gif'}),
+        ]))
+        stdout, stderr = self.import_data(
+            'posts', path, images_dir=self.directory
+        )
+        self.assertIn('Строка 2', stderr)
+        post = Post.objects.get(text='С картинкой')
+        self.assertTrue(default_storage.is_content_addressed(post.image.name))
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertFalse(Post.objects.filter(text='Без файла').exists())
+
+    def test_images_outside_directory_are_rejected(self):
+        """Картинки вне каталога импорта не копируются."""
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside, ignore_errors=True)
+        secret = os.path.join(outside, 'secret.gif')
+        with open(secret, 'wb') as image:
+            image.write(b'GIF89a')
+        relative = os.path.relpath(secret, self.directory)
+        path = self.write('posts.ndjson', '\n'.join(
+            json.dumps({'author': 'Legacy', 'text': name, 'image': name})
+            for name in (secret, relative)
+        ))
+        stdout, stderr = self.import_data(
+            'posts', path, images_dir=self.directory
+        )
+        self.assertIn('Строка 1', stderr)
+        self.assertIn('Строка 2', stderr)
+        self.assertIn('вне каталога импорта', stderr)
+        self.assertFalse(Post.objects.exists())
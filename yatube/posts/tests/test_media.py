@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from core.models import Blob
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SharedImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80'
+            b'\x00\x00\x00\x00\x00\xFF\xFF\xFF\x21\xF9\x04'
+            b'\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00\x02'
+            b'\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_post(self, name='small.gif', **kwargs):
+        image = SimpleUploadedFile(
+            name=name, content=self.small_gif, content_type='image/gif'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                author=self.author, text='Мем', image=image, **kwargs
+            )
+
+    def test_posts_share_image_until_last_is_deleted(self):
+        """Одинаковые картинки хранятся одним файлом до удаления постов."""
+        first = self.create_post()
+        second = self.create_post('copy.gif')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(Blob.objects.get(key=name).refs, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_each_post_gets_own_variants_job(self):
+        """Посты с одной картинкой получают каждый свою генерацию."""
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            first = self.create_post()
+            second = self.create_post('copy.gif')
+        self.assertCountEqual(
+            [call.args for call in submit.call_args_list],
+            [
+                (first.pk, first.image.name),
+                (second.pk, second.image.name),
+            ]
+        )
+
+    def test_reupload_does_not_leak_reference(self):
+        """Повторная загрузка той же картинки не оставляет лишней ссылки."""
+        post = self.create_post()
+        post.image = SimpleUploadedFile(
+            name='again.gif', content=self.small_gif,
+            content_type='image/gif'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(Blob.objects.get(key=post.image.name).refs, 1)
+
+    def test_dedupe_moves_legacy_images(self):
+        """Команда переносит старые картинки под хэш и сливает копии."""
+        legacy = []
+        for number in range(2):
+            name = f'posts/legacy{number}.gif'
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as image:
+                image.write(self.small_gif)
+            Post.objects.create(author=self.author, text='Старый', image=name)
+            legacy.append(name)
+        fresh = self.create_post()
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', stdout=stdout)
+        self.assertIn('Перенесено постов: 2, удалено старых файлов: 2',
+                      stdout.getvalue())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)),
+            {fresh.image.name}
+        )
+        self.assertEqual(Blob.objects.get(key=fresh.image.name).refs, 3)
+        for name in legacy:
+            self.assertFalse(default_storage.exists(name))
@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
-from ..models import Post, Group, Comment, Follow
+from ..models import Post, Group, Comment, Follow, TEXT_PREVIEW_LENGTH
 
 User = get_user_model()
 
@@ -70,3 +70,32 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     model._meta.get_field(field).verbose_name, expected_value)
+
+    def test_text_preview_follows_text(self):
+        """Начало текста пересчитывается при сохранении поста."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Слово ' * TEXT_PREVIEW_LENGTH
+        )
+        self.assertEqual(len(post.text_preview), TEXT_PREVIEW_LENGTH)
+        self.assertTrue(post.text_preview.endswith('…'))
+        post.text = 'Короткий текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_preview, 'Короткий текст')
+
+    def test_feed_manager_skips_heavy_columns(self):
+        """Лентам не загружаются полный текст, описание группы и пароль."""
+        created = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='Пост в группе'
+        )
+        post = Post.feed.get(pk=created.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(post.author.username, self.user.username)
+            self.assertEqual(post.group.slug, self.group.slug)
+            self.assertEqual(post.text_preview, created.text)
+        self.assertIn('text', post.get_deferred_fields())
+        self.assertIn('password', post.author.get_deferred_fields())
+        self.assertIn('description', post.group.get_deferred_fields())
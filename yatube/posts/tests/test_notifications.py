@@ -0,0 +1,160 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from core.testing import strict_query_budgets
+from posts import notifications
+from posts.models import Post, Comment, Follow, Notification
+
+User = get_user_model()
+
+
+@strict_query_budgets
+class NotificationsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.readers = [
+            User.objects.create_user(username=f'Reader{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.author, text='Вирусный')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def tearDown(self):
+        cache.clear()
+
+    def comment(self, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=author, text='Да')
+
+    def test_comments_coalesce(self):
+        """Комментарии к посту сливаются в одно уведомление автору."""
+        for reader in self.readers:
+            self.comment(reader)
+        self.comment(self.author)
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (
+                notification.user,
+                notification.kind,
+                notification.post,
+                notification.actor,
+                notification.count,
+            ),
+            (
+                self.author,
+                Notification.COMMENT,
+                self.post,
+                self.readers[-1],
+                len(self.readers),
+            )
+        )
+
+    def test_follow_notifies_author(self):
+        """Подписка создает уведомление автору о новом подписчике."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.readers[0], author=self.author)
+        self.assertTrue(Notification.objects.filter(
+            user=self.author,
+            kind=Notification.FOLLOW,
+            actor=self.readers[0]
+        ).exists())
+
+    def test_events_written_in_batches(self):
+        """В фоновом режиме события копятся и пишутся одной пачкой."""
+        with mock.patch.object(notifications, '_runs_inline',
+                               return_value=False), \
+                mock.patch.object(notifications, '_start_flusher'):
+            for reader in self.readers:
+                self.comment(reader)
+        self.assertFalse(Notification.objects.exists())
+        with self.assertNumQueries(6):
+            self.assertEqual(notifications.flush(), 1)
+        self.assertEqual(Notification.objects.get().count, len(self.readers))
+        self.assertEqual(notifications.flush(), 0)
+
+    def test_failed_batch_is_requeued(self):
+        """Пачка с временной ошибкой базы пишется при следующем сбросе."""
+        with mock.patch.object(notifications, '_runs_inline',
+                               return_value=False), \
+                mock.patch.object(notifications, '_start_flusher'):
+            self.comment(self.readers[0])
+            with mock.patch.object(
+                notifications, '_alive', side_effect=OperationalError
+            ), self.assertLogs(notifications.logger, 'WARNING'):
+                notifications.flush()
+            self.comment(self.readers[1])
+        self.assertEqual(notifications.flush(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (notification.count, notification.actor),
+            (2, self.readers[1])
+        )
+
+    def test_concurrent_insert_does_not_duplicate(self):
+        """Строку, вставленную другим процессом, пачка не дублирует."""
+        with mock.patch.object(notifications, '_runs_inline',
+                               return_value=False), \
+                mock.patch.object(notifications, '_start_flusher'):
+            self.comment(self.readers[0])
+        with mock.patch.object(
+            Notification.objects, 'filter',
+            return_value=Notification.objects.none()
+        ):
+            Notification.objects.create(
+                user=self.author, kind=Notification.COMMENT,
+                post=self.post, actor=self.readers[1], updated=timezone.now()
+            )
+            notifications.flush()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_events_of_deleted_objects_skipped(self):
+        """Событие об удаленном посте не срывает запись остальных."""
+        other = Post.objects.create(author=self.author, text='Удаленный')
+        with mock.patch.object(notifications, '_runs_inline',
+                               return_value=False), \
+                mock.patch.object(notifications, '_start_flusher'):
+            self.comment(self.readers[0])
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(
+                    post=other, author=self.readers[1], text='Да'
+                )
+        other.delete()
+        self.assertEqual(notifications.flush(), 2)
+        self.assertEqual(
+            list(Notification.objects.values_list('post', flat=True)),
+            [self.post.pk]
+        )
+
+    def test_inbox_marks_read(self):
+        """Страница уведомлений показывает их и отмечает прочитанными."""
+        self.comment(self.readers[0])
+        index = self.author_client.get(reverse('posts:index'))
+        self.assertContains(index, 'badge bg-danger">1<')
+        response = self.author_client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'Новых комментариев к посту')
+        self.assertContains(response, 'list-group-item-info')
+        self.assertEqual(notifications.unread_count(self.author.pk), 0)
+        self.assertNotContains(
+            self.author_client.get(reverse('posts:index')), 'badge bg-danger'
+        )
+
+    def test_read_notification_not_reused(self):
+        """После прочтения новое событие заводит новое уведомление."""
+        self.comment(self.readers[0])
+        notifications.mark_read(self.author.pk)
+        self.comment(self.readers[1])
+        self.assertEqual(
+            list(Notification.objects.values_list('read', 'count')),
+            [(False, 1), (True, 1)]
+        )
+        self.assertEqual(notifications.unread_count(self.author.pk), 1)
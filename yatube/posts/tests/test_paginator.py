@@ -0,0 +1,126 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.core.cache import cache
+from posts.models import Post, Comment
+from posts.paginator import (
+    encode_cursor, decode_cursor, LIMIT_POSTS, LIMIT_COMMENTS
+)
+
+User = get_user_model()
+
+POSTS_COUNT: int = 25
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create(
+            [Post(author=cls.user, text=f'Post {i}')
+             for i in range(POSTS_COUNT)]
+        )
+        cls.guest_client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cursor_round_trip(self):
+        """Курсор поста кодируется и декодируется без потерь."""
+        post = Post.objects.first()
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)),
+            (post.pub_date, post.pk)
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.guest_client.get(
+            reverse('posts:index') + '?after=not-a-cursor'
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertEqual(len(response.context['page_obj']), LIMIT_POSTS)
+
+    def test_walk_forward_and_back_by_cursors(self):
+        """Переходы по курсорам обходят ленту без пропусков и повторов."""
+        url = reverse('posts:index')
+        seen = []
+        pages = []
+        response = self.guest_client.get(url)
+        while True:
+            page = response.context['page_obj']
+            pages.append([post.pk for post in page])
+            seen.extend(pages[-1])
+            if not page.has_next():
+                break
+            cache.clear()
+            response = self.guest_client.get(
+                url + f'?after={page.next_cursor}'
+            )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        cache.clear()
+        response = self.guest_client.get(
+            url + f'?before={page.previous_cursor}'
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            pages[-2]
+        )
+
+    def test_deep_page_has_no_count_query(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET."""
+        post = Post.objects.order_by('-pub_date', '-id')[LIMIT_POSTS]
+        url = reverse('posts:index') + f'?after={encode_cursor(post)}'
+        with self.assertNumQueries(1) as context:
+            self.guest_client.get(url)
+        sql = context.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+
+class CommentPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='TestText')
+        Comment.objects.bulk_create(
+            [Comment(post=cls.post, author=cls.user, text=f'Comment {i}')
+             for i in range(LIMIT_COMMENTS + 5)]
+        )
+        cls.guest_client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_post_detail_renders_first_page_of_comments(self):
+        """Страница поста показывает только первую страницу комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), LIMIT_COMMENTS)
+        self.assertContains(
+            response,
+            reverse('posts:comments', kwargs={'post_id': self.post.pk})
+            + f'?after={comments.next_cursor}'
+        )
+
+    def test_fragment_returns_next_comments(self):
+        """Фрагмент отдает следующие комментарии без повторов."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        first_page = self.guest_client.get(url).context['comments']
+        response = self.guest_client.get(
+            url, {'after': first_page.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        second_page = response.context['comments']
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page))
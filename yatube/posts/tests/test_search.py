@@ -0,0 +1,111 @@
+from urllib.parse import quote
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from posts import search
+from posts.models import Post, Comment
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова сводятся к одной основе."""
+        forms = {
+            'книга': 'книг',
+            'книгами': 'книг',
+            'Ёлками': 'елк',
+            'читающий': 'чита',
+            'python': 'python',
+        }
+        for word, expected in forms.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.exact = Post.objects.create(
+            author=cls.user,
+            text='Лучшие книги года: книги о книгах'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user,
+            text='Прочитал интересную книгу'
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.user,
+            text='Погода сегодня хорошая'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def tearDown(self):
+        cache.clear()
+
+    def found(self, query):
+        return [post_id for post_id, _ in search.backend.search(query, 10)]
+
+    def test_search_matches_word_forms_by_rank(self):
+        """Поиск находит все формы слова, сначала самые релевантные."""
+        self.assertEqual(
+            self.found('книгами'), [self.exact.pk, self.other.pk]
+        )
+
+    def test_comment_matches_its_post(self):
+        """Совпадение в комментарии находит пост один раз."""
+        comment = Comment.objects.create(
+            post=self.unrelated,
+            author=self.user,
+            text='Не забудьте зонт'
+        )
+        self.assertEqual(self.found('зонтом'), [self.unrelated.pk])
+        comment.delete()
+        self.assertEqual(self.found('зонтом'), [])
+
+    def test_index_follows_post_changes(self):
+        """Правка и удаление поста сразу отражаются в индексе."""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        self.assertEqual(self.found('новые'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('новые'), [])
+
+    def test_search_page_paginates_by_cursor(self):
+        """Страница поиска листается курсором и сохраняет запрос."""
+        Post.objects.bulk_create(
+            [Post(author=self.user, text=f'Погода {i}') for i in range(10)]
+        )
+        for post in Post.objects.filter(text__startswith='Погода '):
+            search.backend.index_post(post)
+        response = self.client.get(reverse('posts:search'), {'q': 'погоды'})
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertContains(response, '?q=' + quote('погоды'))
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'погоды', 'after': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 1)
+        self.assertFalse(set(first_page) & set(second_page))
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'погоды', 'before': second_page.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(first_page))
+
+    def test_empty_query_renders_form(self):
+        """Без запроса страница поиска показывает только форму."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertIsNone(response.context['page_obj'])
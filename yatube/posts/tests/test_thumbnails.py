@@ -0,0 +1,108 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80'
+            b'\x00\x00\x00\x00\x00\xFF\xFF\xFF\x21\xF9\x04'
+            b'\x00\x00\x00\x00\x00\x2C\x00\x00\x00\x00\x02'
+            b'\x00\x01\x00\x00\x02\x02\x0C\x0A\x00\x3B'
+        )
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def tearDown(self):
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Text',
+            image=SimpleUploadedFile('small.gif', self.small_gif)
+        )
+
+    def test_placeholder_shown_until_thumbnail_is_ready(self):
+        """Пока миниатюра не готова, в ленте показывается заглушка."""
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        submit.assert_called_once_with(post.pk, post.image.name)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+
+    def test_thumbnail_generated_off_request_replaces_placeholder(self):
+        """Сгенерированная миниатюра заменяет заглушку в карточке."""
+        with mock.patch.object(thumbnails, '_submit', thumbnails.generate):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post, '960x339'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'img/placeholder.svg')
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_variants_are_built_and_offered_in_srcset(self):
+        """Варианты картинки сохраняются с размерами и попадают в srcset."""
+        with mock.patch.object(thumbnails, '_submit', thumbnails.generate):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        post.refresh_from_db()
+        webp = [v for v in post.image_variants if v['format'] == 'webp']
+        self.assertEqual(webp[0]['width'], 320)
+        self.assertEqual(webp[0]['height'], 113)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, webp[0]['name'] + ' 320w')
+
+    def test_cached_feed_shows_variants_built_later(self):
+        """Закэшированная лента получает варианты после их готовности."""
+        with mock.patch.object(thumbnails, '_submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        url = reverse('posts:index')
+        self.assertNotContains(self.guest_client.get(url), 'srcset')
+        thumbnails.generate(*submit.call_args.args)
+        self.assertContains(
+            self.guest_client.get(url), f'variants/{post.pk}/'
+        )
+
+    def test_ready_images_survive_cache_loss(self):
+        """Готовность берется из базы: пустой кэш не пересобирает картинки."""
+        with mock.patch.object(thumbnails, '_submit', thumbnails.generate):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = self.create_post()
+        cache.clear()
+        with mock.patch.object(
+            thumbnails.variants, 'build_variants'
+        ) as build, mock.patch.object(thumbnails.caching, 'bump') as bump:
+            response = self.guest_client.get(reverse('posts:index'))
+            thumbnails.generate(post.pk, post.image.name)
+        self.assertNotContains(response, 'img/placeholder.svg')
+        build.assert_not_called()
+        bump.assert_not_called()
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
+from core.testing import strict_query_budgets
 from posts.models import Post, Group
 from django.core.cache import cache
 from http import HTTPStatus
@@ -7,6 +8,7 @@ from http import HTTPStatus
 User = get_user_model()
 
 
+@strict_query_budgets
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
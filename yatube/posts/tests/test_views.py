@@ -2,10 +2,13 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django import forms
+from core.testing import strict_query_budgets
 from posts.models import Post, Group, Follow
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.core.cache import cache
+import hashlib
 import shutil
 import tempfile
 
@@ -15,6 +18,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@strict_query_budgets
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -36,6 +40,9 @@ class PostPagesTests(TestCase):
             content=cls.small_gif,
             content_type='image/gif'
         )
+        cls.image_name = default_storage.content_name(
+            'posts/small.gif', hashlib.sha256(cls.small_gif).hexdigest()
+        )
         cls.post = Post.objects.create(
             id=9999,
             author=cls.author,
@@ -101,7 +108,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_text_0, self.post.text)
         self.assertEqual(post_author_0, self.author.username)
         self.assertEqual(post_group_0, self.group.slug)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.image_name)
 
     def test_group_posts_page_show_correct_context(self):
         """Шаблон group_posts сформирован с правильным контекстом."""
@@ -127,7 +134,7 @@ class PostPagesTests(TestCase):
         )
         self.assertEqual(
             response.context['page_obj'][0].image,
-            'posts/small.gif'
+            self.image_name
         )
 
     def test_profile_page_show_correct_context(self):
@@ -153,7 +160,7 @@ class PostPagesTests(TestCase):
             response.context['page_obj'][0].group.title, self.group.title
         )
         self.assertEqual(
-            response.context['page_obj'][0].image, 'posts/small.gif'
+            response.context['page_obj'][0].image, self.image_name
         )
 
     def test_post_detail_page_show_correct_context(self):
@@ -172,7 +179,7 @@ class PostPagesTests(TestCase):
             response.context['post'].group.title, self.group.title
         )
         self.assertEqual(
-            response.context['post'].image, 'posts/small.gif'
+            response.context['post'].image, self.image_name
         )
 
     def test_post_create_page_show_correct_context(self):
@@ -225,6 +232,7 @@ class PostPagesTests(TestCase):
         self.assertTrue(Post.objects.get(image__startswith='posts/'))
 
 
+@strict_query_budgets
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -284,6 +292,7 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 3)
 
 
+@strict_query_budgets
 class PostCreateTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -350,6 +359,7 @@ class PostCreateTests(TestCase):
             )
 
 
+@strict_query_budgets
 class FollowsTests(TestCase):
     @classmethod
     def setUpClass(cls):
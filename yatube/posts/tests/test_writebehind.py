@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import writebehind
+from posts.models import Post, Comment, Follow
+
+User = get_user_model()
+
+TEMP_JOURNAL_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    WRITE_BEHIND=True,
+    WRITE_BEHIND_JOURNAL=os.path.join(TEMP_JOURNAL_DIR, 'journal.sqlite3')
+)
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Горячий')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_JOURNAL_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        # Журнал копится, пока его не применят явно.
+        for name in ('_runs_inline', '_start_worker'):
+            patcher = mock.patch.object(
+                writebehind, name, return_value=False
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        writebehind.drain()
+        cache.clear()
+
+    def test_journal_claims(self):
+        """Взятые операции не выдаются повторно до истечения срока."""
+        journal = writebehind.get_journal()
+        first = journal.append(writebehind.COMMENT, {'text': 'a'})
+        second = journal.append(writebehind.COMMENT, {'text': 'b'})
+        self.assertEqual(
+            journal.claim(1), [(first, writebehind.COMMENT, {'text': 'a'})]
+        )
+        self.assertEqual([row[0] for row in journal.claim(5)], [second])
+        self.assertEqual(journal.claim(5), [])
+        self.assertEqual(len(journal.claim(5, timeout=-1)), 2)
+        journal.done([first])
+        self.assertEqual(journal.pending([first, second]), {second})
+        journal.done([second])
+
+    def test_comment_visible_to_author_before_flush(self):
+        """Комментарий пишется в базу позже, но автор видит его сразу."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Отложенный'},
+            follow=True
+        )
+        self.assertRedirects(response, url)
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(response, 'Отложенный')
+        self.assertNotContains(Client().get(url), 'Отложенный')
+
+        self.assertEqual(writebehind.drain(), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(
+            (comment.post, comment.author, comment.text),
+            (self.post, self.reader, 'Отложенный')
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertContains(self.client.get(url), 'Отложенный', count=1)
+        self.assertNotIn(writebehind.SESSION_KEY, self.client.session)
+
+    def test_follow_toggles_collapse(self):
+        """Из переключений подписки в одной пачке применяется последнее."""
+        follow = reverse('posts:profile_follow', args=[self.author.username])
+        unfollow = reverse(
+            'posts:profile_unfollow', args=[self.author.username]
+        )
+        for url in (follow, unfollow, follow):
+            self.client.get(url)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'Отписаться')
+        self.assertFalse(Follow.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writebehind.flush(), 3)
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('DELETE FROM "posts_follow"')
+        ])
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author
+        ).exists())
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+
+    def test_broken_operation_dropped(self):
+        """Операция, которая не применяется, не останавливает очередь."""
+        journal = writebehind.get_journal()
+        journal.append(writebehind.COMMENT, {'post': self.post.pk})
+        journal.append(writebehind.COMMENT, {
+            'post': self.post.pk, 'author': self.reader.pk, 'text': 'Цел'
+        })
+        with self.assertLogs(writebehind.logger, 'ERROR'):
+            self.assertEqual(writebehind.drain(), 2)
+        self.assertEqual(Comment.objects.get().text, 'Цел')
+        self.assertEqual(len(journal), 0)
+
+    def test_transient_failure_is_retried(self):
+        """Операция, упавшая на блокировке базы, остается в журнале."""
+        journal = writebehind.get_journal()
+        journal.append(writebehind.COMMENT, {
+            'post': self.post.pk, 'author': self.reader.pk, 'text': 'Позже'
+        })
+        with mock.patch.object(
+            writebehind, '_apply',
+            side_effect=OperationalError('database is locked')
+        ), self.assertLogs(writebehind.logger, 'WARNING'):
+            self.assertEqual(writebehind.flush(), 1)
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(journal.claim(5), [])
+        self.assertEqual(writebehind.flush(), 0)
+        journal.done([pk for pk, _, _ in journal.claim(5, timeout=-1)])
+
+    def test_comment_keeps_time_seen_by_author(self):
+        """Комментарий записывается со временем из наложения сессии."""
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Когда-то'}
+        )
+        created = self.client.session[writebehind.SESSION_KEY][
+            'comments'
+        ][0]['created']
+        writebehind.drain()
+        self.assertEqual(
+            Comment.objects.get().created.isoformat(), created
+        )
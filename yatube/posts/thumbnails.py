@@ -0,0 +1,127 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from sorl.thumbnail import delete as delete_thumbnails, get_thumbnail
+
+from core import metrics
+
+from . import caching, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Размеры, в которых шаблоны показывают картинки постов.
+THUMBNAIL_SIZES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+PENDING_TIMEOUT: int = 5 * 60
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def _pending_key(post_id, name):
+    # Одну картинку делят несколько постов, а варианты у каждого свои.
+    return f'thumbnail_pending:{post_id}:{name}'
+
+
+def is_ready(image_variants):
+    """Готовы ли миниатюры картинки поста.
+
+    generate строит варианты после миниатюр, поэтому их описания в базе
+    и отмечают готовность. Без форматов для вариантов миниатюры
+    рендерятся прямо при показе, как раньше.
+    """
+    return bool(image_variants) or not variants.available_formats()
+
+
+def ready_thumbnail(post, geometry):
+    """Готовая миниатюра картинки поста или None, если ее еще нет."""
+    if not is_ready(post.image_variants):
+        return None
+    return get_thumbnail(post.image, geometry, **THUMBNAIL_SIZES[geometry])
+
+
+def forget(name):
+    """Удаляет миниатюры картинки из хранилища и kvstore sorl."""
+    delete_thumbnails(name, delete_file=False)
+
+
+def _feed_scopes(post_id):
+    """Области кэша страниц, где показывается карточка поста.
+
+    Закэшированные ленты хранят посты вместе с image_variants, поэтому
+    после вариантов сбрасывается не только карточка.
+    """
+    scopes = [caching.post_scope(post_id)]
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        scopes += [
+            caching.GLOBAL_SCOPE, caching.author_scope(post['author_id'])
+        ]
+        if post['group_id'] is not None:
+            scopes.append(caching.group_scope(post['group_id']))
+    return scopes
+
+
+def generate(post_id, name):
+    """Рендерит все размеры картинки поста и сбрасывает кэш его лент.
+
+    Если варианты текущей картинки уже есть, ничего не делает: повторная
+    постановка в очередь не перекодирует файлы и не сбрасывает ленты.
+    """
+    try:
+        built = Post.objects.filter(pk=post_id, image=name).values_list(
+            'image_variants', flat=True
+        ).first()
+        if built:
+            return
+        for geometry, options in THUMBNAIL_SIZES.items():
+            with metrics.timer(metrics.THUMBNAIL_SECONDS, geometry=geometry):
+                get_thumbnail(name, geometry, **options)
+        variants.build_variants(post_id, name)
+        caching.bump(*_feed_scopes(post_id))
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', name)
+    finally:
+        cache.delete(_pending_key(post_id, name))
+        if not _runs_inline():
+            connections.close_all()
+
+
+def _runs_inline():
+    """Рабочие потоки не могут делить базу SQLite в памяти с запросом."""
+    return settings.THUMBNAIL_WORKERS == 0 or (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def _submit(post_id, name):
+    if _runs_inline():
+        generate(post_id, name)
+    else:
+        _get_executor().submit(generate, post_id, name)
+
+
+def enqueue(post):
+    """Ставит генерацию миниатюр поста в очередь после коммита."""
+    name = post.image.name
+    post_id = post.pk
+    if not name or not cache.add(_pending_key(post_id, name), True,
+                                 PENDING_TIMEOUT):
+        return
+    transaction.on_commit(lambda: _submit(post_id, name))
@@ -10,10 +10,16 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments,
+        name='comments'
+    ),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'
          ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -25,4 +31,21 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'notifications/',
+        views.notification_list,
+        name='notifications'
+    ),
+    path('events/', views.feed_events, name='events'),
+    path(
+        'events/group/<slug:slug>/',
+        views.feed_events,
+        name='group_events'
+    ),
+    path(
+        'events/profile/<str:username>/',
+        views.feed_events,
+        name='profile_events'
+    ),
+    path('events/follow/', views.feed_events, name='follow_events'),
 ]
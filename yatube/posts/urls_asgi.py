@@ -0,0 +1,28 @@
+"""Адреса постов под ASGI: ленты обслуживают асинхронные представления."""
+from django.urls.resolvers import URLPattern
+
+from core.db import async_view
+
+from . import views
+from .urls import app_name, urlpatterns as sync_urlpatterns  # noqa: F401
+
+ASYNC_VIEWS = {
+    view: async_view(view)
+    for view in (
+        views.index,
+        views.group_posts,
+        views.profile,
+        views.post_detail,
+        views.follow_index,
+    )
+}
+
+urlpatterns = [
+    URLPattern(
+        pattern.pattern,
+        ASYNC_VIEWS.get(pattern.callback, pattern.callback),
+        pattern.default_args,
+        pattern.name
+    )
+    for pattern in sync_urlpatterns
+]
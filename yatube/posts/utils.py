@@ -0,0 +1,11 @@
+from itertools import islice
+
+
+def chunked(items, size):
+    """Разбивает итерируемый объект на списки длиной не больше size."""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
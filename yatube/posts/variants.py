@@ -0,0 +1,84 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Post
+
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+VARIANT_ASPECT = 339 / 960
+# Форматы в порядке предпочтения для <source> в <picture>.
+VARIANT_FORMATS = (
+    ('avif', 'AVIF', {'quality': 50}),
+    ('webp', 'WEBP', {'quality': 75, 'method': 4}),
+)
+VARIANTS_DIR = 'variants'
+
+
+def available_formats():
+    """Форматы, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return [
+        (extension, pil_format, options)
+        for extension, pil_format, options in VARIANT_FORMATS
+        if pil_format in Image.SAVE
+    ]
+
+
+def _widths_for(image):
+    """Ширины не больше исходной, но хотя бы одна."""
+    widths = [width for width in VARIANT_WIDTHS if width <= image.width]
+    return widths or VARIANT_WIDTHS[:1]
+
+
+def _variants_dir(post_id):
+    return posixpath.join(VARIANTS_DIR, str(post_id))
+
+
+def delete_variants(variants):
+    for variant in variants:
+        default_storage.delete(variant['name'])
+
+
+def build_variants(post_id, name):
+    """Сохраняет варианты картинки поста разной ширины и формата.
+
+    Описания вариантов с размерами записываются в Post.image_variants,
+    если картинка поста за это время не сменилась.
+    """
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info
+                              else 'RGB')
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    variants = []
+    for width in _widths_for(image):
+        height = round(width * VARIANT_ASPECT)
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for extension, pil_format, options in available_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            saved_name = default_storage.save(
+                posixpath.join(
+                    _variants_dir(post_id), f'{stem}-{width}.{extension}'
+                ),
+                ContentFile(buffer.getvalue())
+            )
+            variants.append({
+                'name': saved_name,
+                'format': extension,
+                'width': width,
+                'height': height,
+            })
+    previous = Post.objects.filter(pk=post_id).values_list(
+        'image_variants', flat=True
+    ).first() or []
+    updated = Post.objects.filter(pk=post_id, image=name).update(
+        image_variants=variants
+    )
+    delete_variants(previous if updated else variants)
+    return variants
@@ -1,71 +1,113 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from core.queries import query_budget
+from .models import Post, Group, User, Follow, Notification
 from .forms import PostForm, CommentForm
-from .paginator import paginator
-from django.views.decorators.cache import cache_page
+from .paginator import (
+    comment_paginator, feed_paginator, notification_paginator,
+    search_paginator
+)
+from .feed import follow_feed
+from .counters import stats_for
+from . import caching, notifications, writebehind
 
 
-@cache_page(20, key_prefix='index_page')
+@query_budget(4)
 def index(request):
-    posts = Post.objects.select_related('author', 'group')
+    posts = Post.feed.all()
     context = {
-        'page_obj': paginator(request, posts)
+        'page_obj': caching.cached_paginator(
+            request, posts, caching.GLOBAL_SCOPE
+        )
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author', 'group')
+    posts = Post.feed.filter(group=group)
     context = {
         'group': group,
-        'page_obj': paginator(request, posts)
+        'page_obj': caching.cached_paginator(
+            request, posts, caching.group_scope(group.pk)
+        )
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author', 'group')
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    posts = Post.feed.filter(author=author)
+    stats = stats_for(author)
+    scopes = (caching.author_scope(author.pk), caching.GROUPS_SCOPE)
     following = False
     if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        )
+        following = writebehind.pending_follow(request, author.pk)
+        if following is None:
+            following = Follow.objects.filter(
+                user=request.user,
+                author=author
+            )
     context = {
         'author': author,
-        'posts_count': posts.count(),
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'following': following,
         'my_page': request.user != author,
-        'page_obj': paginator(request, posts)
+        'page_obj': caching.cached_paginator(request, posts, *scopes)
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(5)
 def post_detail(request, post_id):
     form = CommentForm(
         request.POST or None,
         files=request.FILES or None
     )
-    post = get_object_or_404(Post, id=post_id)
-    posts = post.author.posts.select_related('author', 'group')
-    comments = post.comments.select_related('author', 'post')
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    comments = comment_paginator(
+        request, post.comments.select_related('author')
+    )
     edit_visible = False
     if post.author == request.user:
         edit_visible = True
     context = {
         'post': post,
-        'posts_count': posts.count(),
+        'posts_count': stats_for(post.author).posts_count,
         'edit_visible': edit_visible,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'pending_comments': writebehind.pending_comments(request, post.pk)
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(2)
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': comment_paginator(
+            request, post.comments.select_related('author')
+        )
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@query_budget(11)
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -79,7 +121,9 @@ def post_create(request):
     return redirect('posts:profile', request.user)
 
 
+@query_budget(11)
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
@@ -100,11 +144,17 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(9)
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if not form.is_valid():
+        return redirect('posts:post_detail', post_id)
+    if writebehind.enabled():
+        writebehind.enqueue_comment(request, post, form.cleaned_data['text'])
+    else:
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -112,31 +162,78 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_paginator(request, query) if query else None
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(7)
 @login_required
 def follow_index(request):
-    user = get_object_or_404(User, username=request.user)
-    posts = Post.objects.filter(author__following__user=user)
+    entries, pulled = follow_feed(request.user)
     context = {
-        'page_obj': paginator(request, posts)
+        'page_obj': feed_paginator(request, entries, pulled)
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(13)
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = get_object_or_404(User, username=request.user)
-    if not Follow.objects.filter(user=user, author=author) and author != user:
+    if author == user:
+        return redirect('posts:profile', username)
+    if writebehind.enabled():
+        writebehind.enqueue_follow(request, author, follow=True)
+    elif not Follow.objects.filter(user=user, author=author):
         Follow.objects.create(user=user, author=author)
     return redirect('posts:profile', username)
 
 
+@query_budget(12)
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     user = get_object_or_404(User, username=request.user)
-    Follow.objects.filter(
-        author=author,
-        user=user
-    ).delete()
+    if writebehind.enabled():
+        writebehind.enqueue_follow(request, author, follow=False)
+    else:
+        Follow.objects.filter(
+            author=author,
+            user=user
+        ).delete()
     return redirect('posts:profile', username)
+
+
+@query_budget(6)
+@login_required
+def notification_list(request):
+    page = notification_paginator(
+        request,
+        Notification.objects.filter(user=request.user).select_related(
+            'actor', 'post'
+        ).only(
+            'kind', 'count', 'updated', 'read',
+            'actor__username', 'post__text_preview'
+        )
+    )
+    notifications.mark_read(request.user.pk)
+    return render(request, 'posts/notifications.html', {'page_obj': page})
+
+
+@query_budget(0)
+def feed_events(request, **kwargs):
+    """Поток новых постов ленты; под ASGI его отдает EventStreamRouter.
+
+    Сюда запрос доходит только под WSGI: ответ 204 велит EventSource
+    больше не переподключаться.
+    """
+    return HttpResponse(status=204)
@@ -0,0 +1,380 @@
+"""Отложенная запись комментариев и подписок (write-behind).
+
+С WRITE_BEHIND проверенные формы не пишутся в базу сайта внутри запроса:
+операция добавляется в журнал — файл SQLite на локальном диске, общий
+для процессов машины, — а фоновый поток раз в WRITE_BEHIND_INTERVAL
+секунд применяет накопленное пачками, по транзакции на пачку. Так
+всплеск комментариев к одному посту не выстраивает запросы в очередь за
+блокировкой записи.
+
+Операция удаляется из журнала после коммита пачки, поэтому она
+применяется хотя бы раз; после падения процесса между коммитом и
+удалением комментарий может записаться дважды. Операция, которая не
+применилась из-за временной ошибки базы (например, «database is
+locked»), остается в журнале и берется снова через CLAIM_TIMEOUT.
+Пока операция не применена, ее автор видит ее через наложение в своей
+сессии.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import (
+    InterfaceError, OperationalError, connection, connections, transaction
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching
+from .models import Comment, Follow, Post, User
+
+logger = logging.getLogger(__name__)
+
+COMMENT = 'comment'
+FOLLOW = 'follow'
+FLUSH_BATCH_SIZE: int = 500
+# Через сколько секунд операции, взятые упавшим обработчиком, можно
+# взять снова.
+CLAIM_TIMEOUT: int = 60
+SESSION_KEY = 'write_behind'
+# Ошибки, после которых операцию стоит повторить, а не отбрасывать.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+_journal = None
+_worker = None
+_lock = threading.Lock()
+
+
+class Journal:
+    """Очередь операций в файле SQLite.
+
+    Номера операций не переиспользуются (AUTOINCREMENT), поэтому по
+    номеру можно узнать, применена ли операция: ее больше нет в журнале.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        db = getattr(self._local, 'connection', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=20, isolation_level=None)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = FULL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS operations ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'kind TEXT NOT NULL, '
+                'payload TEXT NOT NULL, '
+                'claimed REAL)'
+            )
+            self._local.connection = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def append(self, kind, payload):
+        """Добавляет операцию, возвращает ее номер."""
+        return self._connection().execute(
+            'INSERT INTO operations (kind, payload) VALUES (?, ?)',
+            (kind, json.dumps(payload))
+        ).lastrowid
+
+    def claim(self, limit, timeout=CLAIM_TIMEOUT):
+        """Берет в работу до limit старейших операций: [(id, kind, payload)].
+
+        Взятые операции не достаются другим процессам timeout секунд.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                'SELECT id, kind, payload FROM operations '
+                'WHERE claimed IS NULL OR claimed < ? ORDER BY id LIMIT ?',
+                (now - timeout, limit)
+            ).fetchall()
+            db.executemany(
+                'UPDATE operations SET claimed = ? WHERE id = ?',
+                [(now, row[0]) for row in rows]
+            )
+        return [(pk, kind, json.loads(payload)) for pk, kind, payload in rows]
+
+    def done(self, ids):
+        """Удаляет примененные операции."""
+        with self._transaction() as db:
+            db.executemany(
+                'DELETE FROM operations WHERE id = ?', [(pk,) for pk in ids]
+            )
+
+    def pending(self, ids):
+        """Номера из ids, которые еще ждут применения."""
+        ids = list(ids)
+        if not ids:
+            return set()
+        placeholders = ', '.join('?' * len(ids))
+        return {
+            row[0] for row in self._connection().execute(
+                f'SELECT id FROM operations WHERE id IN ({placeholders})',
+                ids
+            )
+        }
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM operations'
+        ).fetchone()[0]
+
+
+def enabled():
+    return settings.WRITE_BEHIND
+
+
+def get_journal():
+    global _journal
+    path = settings.WRITE_BEHIND_JOURNAL
+    with _lock:
+        if _journal is None or _journal.path != path:
+            _journal = Journal(path)
+        return _journal
+
+
+def _apply(operations):
+    """Применяет операции одной транзакцией базы сайта.
+
+    Из переключений подписки на одного автора применяется последнее.
+    Операции с удаленными постами и пользователями пропускаются.
+    Комментарий получает время, которое его автор видел в наложении.
+    """
+    comments = [payload for _, kind, payload in operations
+                if kind == COMMENT]
+    follows = {
+        (payload['user'], payload['author']): payload['follow']
+        for _, kind, payload in operations if kind == FOLLOW
+    }
+    user_ids = {payload['author'] for payload in comments}
+    for pair in follows:
+        user_ids.update(pair)
+    with transaction.atomic():
+        users = set(
+            User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        )
+        posts = Post.objects.only('author').in_bulk(
+            {payload['post'] for payload in comments}
+        )
+        dated = []
+        for payload in comments:
+            post = posts.get(payload['post'])
+            if post is not None and payload['author'] in users:
+                comment = Comment.objects.create(
+                    post=post, author_id=payload['author'],
+                    text=payload['text']
+                )
+                if payload.get('created'):
+                    comment.created = parse_datetime(payload['created'])
+                    dated.append(comment)
+        if dated:
+            Comment.objects.bulk_update(dated, ['created'])
+        for (user_id, author_id), follow in follows.items():
+            if user_id not in users or author_id not in users:
+                continue
+            if follow:
+                Follow.objects.get_or_create(
+                    user_id=user_id, author_id=author_id
+                )
+            else:
+                Follow.objects.filter(
+                    user_id=user_id, author_id=author_id
+                ).delete()
+
+
+def flush(limit=FLUSH_BATCH_SIZE):
+    """Применяет одну пачку операций журнала, возвращает ее размер.
+
+    Если пачка не применилась, операции применяются по одной. Те, что
+    упали на временной ошибке базы, остаются взятыми и повторяются
+    после CLAIM_TIMEOUT; остальные неприменимые пишутся в лог и
+    отбрасываются: одна испорченная операция не должна останавливать
+    очередь.
+    """
+    journal = get_journal()
+    operations = journal.claim(limit)
+    if not operations:
+        return 0
+    try:
+        _apply(operations)
+    except Exception:
+        logger.exception('Пачка отложенных записей не применилась')
+        finished = []
+        for operation in operations:
+            try:
+                _apply([operation])
+            except TRANSIENT_ERRORS:
+                logger.warning(
+                    'Отложенная запись %s будет повторена', operation,
+                    exc_info=True
+                )
+                continue
+            except Exception:
+                logger.exception('Отложенная запись %s отброшена', operation)
+            finished.append(operation[0])
+        journal.done(finished)
+    else:
+        journal.done([pk for pk, _, _ in operations])
+    return len(operations)
+
+
+def drain():
+    """Применяет весь журнал, возвращает число операций."""
+    total = 0
+    while True:
+        count = flush()
+        if not count:
+            return total
+        total += count
+
+
+def _run():
+    while True:
+        time.sleep(settings.WRITE_BEHIND_INTERVAL)
+        try:
+            drain()
+        except Exception:
+            logger.exception('Не удалось применить отложенные записи')
+        finally:
+            connections.close_all()
+
+
+def _runs_inline():
+    """Поток записи не видит базу SQLite в памяти: она у каждого своя."""
+    return settings.WRITE_BEHIND_INTERVAL == 0 or (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def _start_worker():
+    global _worker
+    with _lock:
+        if _worker is not None:
+            return
+        _worker = threading.Thread(
+            target=_run, name='write-behind', daemon=True
+        )
+        _worker.start()
+
+
+def _schedule():
+    if _runs_inline():
+        drain()
+    else:
+        _start_worker()
+
+
+def _remember(request, comment=None, follow=None):
+    overlay = request.session.get(SESSION_KEY) or {
+        'comments': [], 'follows': {}
+    }
+    if comment is not None:
+        overlay['comments'].append(comment)
+    if follow is not None:
+        author_id, state = follow
+        overlay['follows'][str(author_id)] = state
+    request.session[SESSION_KEY] = overlay
+    request._write_behind = None
+
+
+def enqueue_comment(request, post, text):
+    """Ставит комментарий пользователя к посту в журнал."""
+    created = timezone.now().isoformat()
+    operation_id = get_journal().append(COMMENT, {
+        'post': post.pk,
+        'author': request.user.pk,
+        'text': text,
+        'created': created,
+    })
+    _remember(request, comment={
+        'id': operation_id,
+        'post': post.pk,
+        'text': text,
+        'created': created,
+    })
+    caching.bump(caching.post_scope(post.pk))
+    _schedule()
+
+
+def enqueue_follow(request, author, follow):
+    """Ставит подписку (follow=True) или отписку от автора в журнал."""
+    operation_id = get_journal().append(FOLLOW, {
+        'user': request.user.pk, 'author': author.pk, 'follow': follow
+    })
+    _remember(request, follow=(author.pk, [operation_id, follow]))
+    caching.bump(
+        caching.author_scope(author.pk),
+        caching.following_scope(request.user.pk)
+    )
+    _schedule()
+
+
+def _overlay(request):
+    """Еще не примененные операции сессии; примененные из нее убираются."""
+    overlay = getattr(request, '_write_behind', None)
+    if overlay is not None:
+        return overlay
+    overlay = {'comments': [], 'follows': {}}
+    if enabled() and request.user.is_authenticated:
+        stored = request.session.get(SESSION_KEY)
+        if stored:
+            pending = get_journal().pending(
+                [comment['id'] for comment in stored['comments']]
+                + [state[0] for state in stored['follows'].values()]
+            )
+            overlay = {
+                'comments': [
+                    comment for comment in stored['comments']
+                    if comment['id'] in pending
+                ],
+                'follows': {
+                    author_id: state
+                    for author_id, state in stored['follows'].items()
+                    if state[0] in pending
+                },
+            }
+            if overlay != stored:
+                if overlay['comments'] or overlay['follows']:
+                    request.session[SESSION_KEY] = overlay
+                else:
+                    del request.session[SESSION_KEY]
+    request._write_behind = overlay
+    return overlay
+
+
+def pending_comments(request, post_id):
+    """Не примененные комментарии пользователя к посту, новые сверху."""
+    return [
+        Comment(
+            post_id=post_id,
+            author=request.user,
+            text=comment['text'],
+            created=parse_datetime(comment['created'])
+        )
+        for comment in reversed(_overlay(request)['comments'])
+        if comment['post'] == post_id
+    ]
+
+
+def pending_follow(request, author_id):
+    """Не примененная подписка на автора: True, False или None, если ее нет."""
+    state = _overlay(request)['follows'].get(str(author_id))
+    return None if state is None else state[1]
@@ -0,0 +1,15 @@
+// Показывает, сколько новых постов появилось в ленте, по событиям
+// сервера вместо перезагрузки страницы.
+document.querySelectorAll('.live-updates').forEach(function (banner) {
+  if (!window.EventSource) {
+    return;
+  }
+  var link = banner.querySelector('a');
+  var posts = new Set();
+  var source = new EventSource(banner.dataset.events);
+  source.addEventListener('post', function (event) {
+    posts.add(event.lastEventId);
+    link.textContent = 'Новых постов: ' + posts.size + '. Показать';
+    banner.classList.remove('d-none');
+  });
+});
@@ -44,17 +44,21 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.AsgiUrlconfMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryInspectionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,15 +66,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.ReadOnlyViewsMiddleware',
+    'posts.middleware.ConditionalPagesMiddleware',
 ]
 
+# debug_toolbar — инструмент разработки, в продакшене он только
+# замедляет ответы.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
+# Адреса для запросов через ASGI: ленты в них асинхронные.
+ASGI_URLCONF = 'yatube.urls_asgi'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,22 +93,108 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.notifications.unread_notifications',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+
+# Размер пула потоков, в котором асинхронные представления ходят в базу
+# и рендерят шаблоны; это же предел одновременных соединений процесса
+# с базой. 0 — выполнять в потоке запроса.
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', 20))
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Бэкенд выбирается переменными окружения: по умолчанию локальный SQLite,
+# для продакшена DB_ENGINE=django.db.backends.postgresql.
+# DB_POOLER=pgbouncer включает режим работы через пулер соединений
+# в режиме transaction pooling.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.sqlite3')
+
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'OPTIONS': {
+                'timeout': 20,
+            },
+        }
     }
+    if os.getenv('DB_READ_REPLICA'):
+        # Тот же файл, открытый только на чтение: в режиме WAL читатели
+        # не блокируют писателя.
+        DATABASES['replica'] = {
+            'ENGINE': DB_ENGINE,
+            'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+            'OPTIONS': {
+                'timeout': 20,
+            },
+            'TEST': {
+                'MIRROR': 'default',
+            },
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {
+                'MIRROR': 'default',
+            },
+        }
+    if os.getenv('DB_POOLER') == 'pgbouncer':
+        # Серверные курсоры не переживают смену соединения пулером
+        # между транзакциями.
+        for database in DATABASES.values():
+            database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+DATABASE_ROUTERS = ['core.db.ReadReplicaRouter']
+
+# Представления, чьи GET-запросы читают из соединения replica.
+READ_REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:comments',
+    'api:posts',
+    'api:post',
+    'api:comments',
+    'api:group_posts',
+    'api:profile',
+]
+
+# Страницы, которые отвечают 304 на условные GET-запросы, и функции,
+# возвращающие области кэша, от которых зависит страница.
+CONDITIONAL_VIEWS = {
+    'posts:index': 'posts.freshness.index_scopes',
+    'posts:group_list': 'posts.freshness.group_scopes',
+    'posts:profile': 'posts.freshness.profile_scopes',
+    'posts:post_detail': 'posts.freshness.post_scopes',
+    'posts:comments': 'posts.freshness.post_scopes',
 }
 
 
@@ -148,14 +247,94 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Медиафайлы лежат в S3-совместимом хранилище: MEDIA_OBJECT_STORE —
+# фабрика клиента (LocalObjectStore хранит объекты в MEDIA_ROOT,
+# core.storage.s3_client — boto3 с MEDIA_S3_ENDPOINT_URL). Загрузки
+# с путями из CONTENT_ADDRESSED_PREFIXES хранятся под хэшем содержимого.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+MEDIA_OBJECT_STORE = os.getenv(
+    'MEDIA_OBJECT_STORE', 'core.storage.LocalObjectStore'
+)
+MEDIA_BUCKET = os.getenv('MEDIA_BUCKET', 'yatube')
+CONTENT_ADDRESSED_PREFIXES = ('posts/',)
+
+# Число потоков, которые готовят миниатюры картинок вне запроса;
+# 0 — готовить сразу после коммита в том же потоке.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Раз в сколько секунд накопленные уведомления пишутся в базу;
+# 0 — писать сразу после коммита в том же потоке.
+NOTIFICATIONS_FLUSH_INTERVAL = float(
+    os.getenv('NOTIFICATIONS_FLUSH_INTERVAL', 1)
+)
+
+# Отложенная запись комментариев и подписок: операции копятся в журнале
+# WRITE_BEHIND_JOURNAL (файл SQLite на локальном диске) и применяются
+# пачками раз в WRITE_BEHIND_INTERVAL секунд; 0 — сразу в запросе.
+WRITE_BEHIND = bool(os.getenv('WRITE_BEHIND'))
+WRITE_BEHIND_JOURNAL = os.getenv(
+    'WRITE_BEHIND_JOURNAL', os.path.join(BASE_DIR, 'write_behind.sqlite3')
+)
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', 0.5))
+
+# Поисковый индекс по постам и комментариям. Для SQLite по умолчанию
+# используется FTS5, для остальных СУБД поиск выключен, пока не задан
+# свой бэкенд.
+SEARCH_BACKEND = os.getenv(
+    'SEARCH_BACKEND',
+    'posts.search.SqliteFtsBackend'
+    if DB_ENGINE == 'django.db.backends.sqlite3'
+    else 'posts.search.SearchBackend'
+)
+
+# Брокер событий для уведомлений о новых постах. LocalBroker работает
+# в памяти одного процесса; при нескольких процессах нужен общий брокер
+# с интерфейсом core.pubsub.Broker.
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'core.pubsub.LocalBroker')
+
+# Кэш должен быть общим для всех процессов сайта: сбросы поколений
+# страниц, отметки готовых миниатюр и счетчики уведомлений из одного
+# процесса должны видеть остальные. Например, CACHE_BACKEND =
+# core.metrics.TimedPyMemcacheCache и CACHE_LOCATION = 127.0.0.1:11211.
+# Кэш в памяти процесса этого не умеет, поэтому с ним записи живут не
+# дольше LOCAL_CACHE_TIMEOUT секунд.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        'BACKEND': os.getenv('CACHE_BACKEND', 'core.metrics.TimedLocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
+LOCAL_CACHE_TIMEOUT = int(os.getenv('LOCAL_CACHE_TIMEOUT', 20))
+
+# Доля запросов к сайту, для которых проверяются бюджеты запросов к базе
+# (@query_budget) и повторяющиеся запросы N+1. Нарушения пишутся в лог,
+# а в строгом режиме поднимают исключение.
+QUERY_INSPECTION_SAMPLE_RATE = float(
+    os.getenv('QUERY_INSPECTION_SAMPLE_RATE', 0.01)
+)
+QUERY_INSPECTION_STRICT = DEBUG
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Профилирование запросов: доля случайных запросов, интервал снимков
+# стека в секундах, каталог и число хранимых профилей, срок жизни
+# токена из админки в секундах.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL = 0.001
+PROFILES_DIR = os.getenv('PROFILES_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILES_KEEP = 200
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Доступ Prometheus к /metrics/: заголовок Authorization: Bearer
+# METRICS_TOKEN или адрес из METRICS_ALLOWED_IPS. Без них метрики закрыты.
+# За прокси на той же машине все клиенты приходят с 127.0.0.1, поэтому
+# адреса годятся только для прямых подключений.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    address for address in os.getenv('METRICS_ALLOWED_IPS', '').split(',')
+    if address
+]
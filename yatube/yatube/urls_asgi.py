@@ -0,0 +1,14 @@
+"""Адреса под ASGI (ASGI_URLCONF): отличаются от yatube.urls лентами."""
+from django.urls import include, path
+
+from .urls import (  # noqa: F401
+    handler403, handler404, handler500, urlpatterns as sync_urlpatterns
+)
+
+urlpatterns = [
+    path('', include('posts.urls_asgi', namespace='posts')),
+    *[
+        pattern for pattern in sync_urlpatterns
+        if getattr(pattern, 'namespace', None) != 'posts'
+    ],
+]